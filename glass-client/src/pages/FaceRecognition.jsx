@@ -403,11 +403,13 @@ const FaceRecognition = () => {
 
     const faceWsRef = useRef(null);
     const isWaitingForResponseRef = useRef(false);
+    const lastFrameSentRef = useRef(0);
+    const frameIntervalRef = useRef(MIN_REQUEST_INTERVAL); // Adapted from the server's target_fps hint
     const connectFaceWebSocketRef = useRef();
 
     // Initial connection to Face Recognition WebSocket
 
-    const tracksRef = useRef([]); // [{ id, x, y, w, h, lastSeen, data }]
+    const tracksRef = useRef([]); // [{ id, serverId, x, y, w, h, lastSeen, data }]
     const nextTrackIdRef = useRef(1);
 
     const updateTracks = useCallback((newDetections) => {
@@ -433,9 +435,19 @@ const FaceRecognition = () => {
             .sort((a, b) => (newDetections[b].position.width * newDetections[b].position.height) -
                 (newDetections[a].position.width * newDetections[a].position.height));
 
+        // Server-side tracker ids win: the same track_id is always the same person box
+        newDetections.forEach((detection, idx) => {
+            if (detection.track_id == null) return;
+            const tIdx = tracksRef.current.findIndex((track, i) => !usedTracks.has(i) && track.serverId === detection.track_id);
+            if (tIdx !== -1) {
+                assignments[idx] = tIdx;
+                usedTracks.add(tIdx);
+            }
+        });
+
         for (const idx of sortedIndices) {
             const center = newCenters[idx];
-            if (!center) continue;
+            if (!center || assignments[idx] !== -1) continue;
 
             let bestTrackIndex = -1;
             let minDist = MAX_MATCH_DIST;
@@ -481,6 +493,7 @@ const FaceRecognition = () => {
                     w: detection.position.width,
                     h: detection.position.height,
                     lastSeen: timestamp,
+                    serverId: detection.track_id ?? track.serverId,
                     data: detection // Update recognition data (name could change if recognition improves)
                 });
             } else {
@@ -492,6 +505,7 @@ const FaceRecognition = () => {
                     w: detection.position.width,
                     h: detection.position.height,
                     lastSeen: timestamp,
+                    serverId: detection.track_id,
                     data: detection
                 });
             }
@@ -631,6 +645,7 @@ const FaceRecognition = () => {
 
             // Send via WebSocket
             faceWsRef.current.send(blob);
+            lastFrameSentRef.current = performance.now();
             isWaitingForResponseRef.current = true;
             // Next frame trigger is in onmessage
 
@@ -673,11 +688,26 @@ const FaceRecognition = () => {
             isWaitingForResponseRef.current = false;
             try {
                 const data = JSON.parse(event.data);
-                handleRecognitionResult(data);
+                // Server sends { results, dropped_frames, target_fps, ... }; older servers sent a bare list
+                const results = Array.isArray(data) ? data : (data.results ?? data);
+                if (data.target_fps) {
+                    frameIntervalRef.current = Math.max(MIN_REQUEST_INTERVAL, 1000 / data.target_fps);
+                }
+                if (data.error) {
+                    // Frame failed on the server; keep the last results and send the next one
+                    console.warn("Face recognition error:", data.error);
+                } else {
+                    handleRecognitionResult(results);
+                }
 
-                // Immediately trigger next frame after receiving response for lowest latency
+                // Trigger next frame as soon as the server can take it (target_fps pacing)
                 // Use requestAnimationFrame to sync with display refresh
-                requestAnimationFrame(processFrame);
+                const wait = frameIntervalRef.current - (performance.now() - lastFrameSentRef.current);
+                if (wait > 0) {
+                    setTimeout(() => requestAnimationFrame(processFrame), wait);
+                } else {
+                    requestAnimationFrame(processFrame);
+                }
             } catch (e) {
                 console.error("Face WS parse error:", e);
                 // Continue loop even on error
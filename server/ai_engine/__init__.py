@@ -1 +1,2 @@
-from .face_engine import load_models, recognize_face, detect_and_embed, sync_embeddings_from_db
+from .face_engine import load_models, recognize_face, detect_and_embed, detect_faces, embed_faces, sync_embeddings_from_db
+from .face_gallery import gallery_index
@@ -1,13 +1,21 @@
 from .asr_engine import ASREngine
-from .vad_engine import VADEngine
+from .vad_engine import VADEngine, SpeechSegmenter
 from .audio_stream import AudioStream
 from .conversation_store import ConversationStore
 from .conversation_linker import ConversationLinker
+from .streaming_transcriber import StreamingTranscriber
+from .audio_buffer import AudioRingBuffer
+from .asr_pool import ASREnginePool, ASRQueueFull
 
 __all__ = [
     "ASREngine",
     "VADEngine",
+    "SpeechSegmenter",
     "AudioStream",
     "ConversationStore",
-    "ConversationLinker"
+    "ConversationLinker",
+    "StreamingTranscriber",
+    "AudioRingBuffer",
+    "ASREnginePool",
+    "ASRQueueFull"
 ]
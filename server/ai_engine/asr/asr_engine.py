@@ -1,31 +1,43 @@
 import numpy as np
 import os
-from typing import Union
+from typing import List, Tuple, Union
 from collections import deque
 import time
 from faster_whisper import WhisperModel
 
 class ASREngine:
-    def __init__(self, model_size: str = "base.en"):
+    def __init__(self, model_size: str = "base.en", cpu_threads: int = 0, num_workers: int = 1):
         # Faster Whisper handles device selection automatically relative to availability
         # On Mac, it uses CTranslate2 which is optimized for CPU/Arm
         device = "cpu" 
         compute_type = "int8" # Quantization for speed
         
+        # cpu_threads=0 lets CTranslate2 pick; set it when several models share the CPU
+        options = dict(device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+
         print(f"Loading Faster Whisper model '{model_size}' on {device} with {compute_type}...")
         try:
-             self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+             self.model = WhisperModel(model_size, **options)
              print("✓ Faster Whisper model loaded successfully.")
         except Exception as e:
              print(f"Error loading Faster Whisper: {e}")
              print("Falling back to tiny.en...")
-             self.model = WhisperModel("tiny.en", device=device, compute_type=compute_type)
+             self.model = WhisperModel("tiny.en", **options)
 
         # Cache for smoother transcription
         self.last_transcript = ""
         self.last_transcript_time = 0
         self.transcript_cache = deque(maxlen=3)
         
+    @staticmethod
+    def _normalize(audio_data: np.ndarray) -> np.ndarray:
+        if audio_data.dtype != np.float32:
+            audio_data = audio_data.astype(np.float32)
+        max_val = np.abs(audio_data).max()
+        if max_val > 0:
+            audio_data = audio_data / max_val * 0.95
+        return audio_data
+
     def transcribe_audio_chunk(self, audio_data: Union[np.ndarray, str]) -> str:
         """
         Transcribe audio chunk using Faster Whisper.
@@ -35,13 +47,8 @@ class ASREngine:
         try:
             if not isinstance(audio_data, str):
                 if len(audio_data) == 0: return ""
-                if audio_data.dtype != np.float32:
-                    audio_data = audio_data.astype(np.float32)
-                
                 # Normalize
-                max_val = np.abs(audio_data).max()
-                if max_val > 0:
-                    audio_data = audio_data / max_val * 0.95
+                audio_data = self._normalize(audio_data)
 
             # Transcribe with greedy decoding (beam_size=1) for maximum speed
             segments, info = self.model.transcribe(
@@ -66,3 +73,34 @@ class ASREngine:
         except Exception as e:
             print(f"Transcription error: {e}")
             return ""
+
+    def transcribe_words(self, audio_data: np.ndarray, initial_prompt: str = None,
+                         beam_size: int = 1) -> List[Tuple[float, float, str, float]]:
+        """
+        Transcribe a float32 array with word timestamps, for streaming.
+        Returns (start, end, text, probability) per word, times in seconds from
+        the start of `audio_data`. `initial_prompt` is previously committed text,
+        which keeps the decoder consistent across calls on a trimmed buffer.
+        Greedy by default; re-decodes of short regions can afford a beam.
+        """
+        if len(audio_data) == 0:
+            return []
+        try:
+            segments, info = self.model.transcribe(
+                self._normalize(audio_data),
+                beam_size=beam_size,
+                language="en",
+                initial_prompt=initial_prompt or None,
+                condition_on_previous_text=False,
+                word_timestamps=True,
+                vad_filter=True,
+                vad_parameters=dict(min_silence_duration_ms=500)
+            )
+            words = []
+            for segment in segments:
+                for word in segment.words or []:
+                    words.append((word.start, word.end, word.word, word.probability))
+            return words
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            return []
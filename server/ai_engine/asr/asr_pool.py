@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from .asr_engine import ASREngine
+
+# Whisper model instances, each served by its own thread
+ASR_POOL_SIZE = int(os.getenv("ASR_POOL_SIZE", "2"))
+# CTranslate2 threads per instance (0 = an even share of the cores) and parallel decodes per instance
+ASR_CPU_THREADS = int(os.getenv("ASR_CPU_THREADS", "0"))
+ASR_NUM_WORKERS = int(os.getenv("ASR_NUM_WORKERS", "1"))
+# Subtitle jobs are rejected once this many jobs are waiting
+ASR_MAX_QUEUE = int(os.getenv("ASR_MAX_QUEUE", "8"))
+# Finalization jobs are rejected once this many of them are waiting
+ASR_MAX_FINAL_QUEUE = int(os.getenv("ASR_MAX_FINAL_QUEUE", "32"))
+
+# Lower runs first
+PRIORITY_FINAL = 0
+PRIORITY_SUBTITLE = 1
+
+class ASRQueueFull(RuntimeError):
+    """Raised when a job is submitted while the ASR queue is at capacity for its priority."""
+
+class _ASRJob:
+    def __init__(self, fn, args, priority, session):
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.session = session
+        self.future = Future()
+        self.dropped = False
+        self.enqueued_at = time.perf_counter()
+
+class ASREnginePool:
+    """
+    Fixed set of Whisper models shared by all live ASR sessions.
+    Jobs wait in one priority queue: finalization (utterance end, session
+    close) runs before subtitles. A session has at most one queued subtitle
+    job; a newer one replaces it and the old job resolves to None, since only
+    the latest subtitle is worth showing. Subtitle jobs are rejected with
+    ASRQueueFull once `max_queue` jobs are waiting, so overload skips
+    subtitles instead of slowing every session down. Finalization jobs queue
+    past that, up to `max_final_queue` of them.
+    Each model gets `cpu_threads` so the pool as a whole does not
+    oversubscribe the CPU.
+    """
+    def __init__(self, size=ASR_POOL_SIZE, cpu_threads=ASR_CPU_THREADS, num_workers=ASR_NUM_WORKERS,
+                 max_queue=ASR_MAX_QUEUE, max_final_queue=ASR_MAX_FINAL_QUEUE, model_size="base.en"):
+        size = max(1, size)
+        if cpu_threads <= 0:
+            cpu_threads = max(1, (os.cpu_count() or 1) // size)
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.max_queue = max_queue
+        self.max_final_queue = max_final_queue
+        self.engines = [ASREngine(model_size, cpu_threads=cpu_threads, num_workers=num_workers) for _ in range(size)]
+
+        self._heap = []
+        self._order = itertools.count()
+        self._waiting = 0
+        self._waiting_final = 0
+        self._queued_subtitles = {}
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        # Metrics
+        self.completed = {PRIORITY_FINAL: 0, PRIORITY_SUBTITLE: 0}
+        self.dropped = 0
+        self.rejected = 0
+        self.final_rejected = 0
+        self._wait_ms = {PRIORITY_FINAL: deque(maxlen=1000), PRIORITY_SUBTITLE: deque(maxlen=1000)}
+
+        self._workers = [
+            threading.Thread(target=self._run, args=(engine,), name=f"asr-pool-{i}", daemon=True)
+            for i, engine in enumerate(self.engines)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, *args, priority=PRIORITY_FINAL, session=None):
+        """
+        Queue `fn(engine, *args)` and return a Future with its result.
+        A subtitle job for `session` replaces that session's queued one.
+        """
+        job = _ASRJob(fn, args, priority, session)
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("ASR engine pool is stopped")
+            if priority == PRIORITY_SUBTITLE:
+                stale = self._queued_subtitles.pop(session, None) if session is not None else None
+                if stale is not None:
+                    stale.dropped = True
+                    self._waiting -= 1
+                    self.dropped += 1
+                    # Its caller may have cancelled it already (session closed)
+                    if stale.future.set_running_or_notify_cancel():
+                        stale.future.set_result(None)
+                if self._waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise ASRQueueFull("ASR queue is full")
+                if session is not None:
+                    self._queued_subtitles[session] = job
+            else:
+                if self._waiting_final >= self.max_final_queue:
+                    self.final_rejected += 1
+                    raise ASRQueueFull("ASR finalization queue is full")
+                self._waiting_final += 1
+            heapq.heappush(self._heap, (priority, next(self._order), job))
+            self._waiting += 1
+            self._condition.notify()
+        return job.future
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                while not self._heap and not self._stopped:
+                    self._condition.wait()
+                if not self._heap:
+                    return None
+                _, _, job = heapq.heappop(self._heap)
+                if job.dropped:
+                    continue
+                self._waiting -= 1
+                if job.priority == PRIORITY_FINAL:
+                    self._waiting_final -= 1
+                elif self._queued_subtitles.get(job.session) is job:
+                    del self._queued_subtitles[job.session]
+                if job.future.cancelled():
+                    continue
+                return job
+
+    def _run(self, engine):
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            # Cancelled between _next_job() and now: nothing is waiting for it
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            self._wait_ms[job.priority].append((time.perf_counter() - job.enqueued_at) * 1000)
+            try:
+                job.future.set_result(job.fn(engine, *job.args))
+            except Exception as e:
+                job.future.set_exception(e)
+            with self._condition:
+                self.completed[job.priority] += 1
+
+    def stop(self):
+        """Let the worker threads exit once the jobs already queued are done."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def stats(self):
+        def p50(samples):
+            return round(float(np.percentile(np.array(samples), 50)), 2) if samples else 0.0
+        return {
+            "engines": len(self.engines),
+            "cpu_threads": self.cpu_threads,
+            "num_workers": self.num_workers,
+            "queue_depth": self._waiting,
+            "queue_capacity": self.max_queue,
+            "final_queue_depth": self._waiting_final,
+            "final_queue_capacity": self.max_final_queue,
+            "final_completed": self.completed[PRIORITY_FINAL],
+            "subtitle_completed": self.completed[PRIORITY_SUBTITLE],
+            "subtitles_dropped": self.dropped,
+            "subtitles_rejected": self.rejected,
+            "finals_rejected": self.final_rejected,
+            "final_wait_ms_p50": p50(self._wait_ms[PRIORITY_FINAL]),
+            "subtitle_wait_ms_p50": p50(self._wait_ms[PRIORITY_SUBTITLE]),
+        }
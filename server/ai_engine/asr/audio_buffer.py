@@ -0,0 +1,92 @@
+import numpy as np
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity float32 audio window for live transcription.
+    Every sample is written twice, at i and i + capacity, so the buffered
+    window is always one contiguous slice: view() never copies. Appending
+    copies only the new chunk and dropping old audio just moves the head.
+    A cumulative sum of squares is kept alongside, so rms() of the window
+    costs O(1) instead of a pass over it.
+    Once full, appending drops the oldest samples.
+    """
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        # Energy (sum of squares) of the stream up to and including each sample, by slot
+        self._cum = np.zeros(self.capacity, dtype=np.float64)
+        # Absolute sample indices: [head, tail) is buffered
+        self.head = 0
+        self.tail = 0
+        self._energy = 0.0
+        self._head_energy = 0.0
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def _energy_after(self, sample):
+        """Stream energy up to and including absolute `sample` (-1 = none)."""
+        return self._cum[sample % self.capacity] if sample >= 0 else 0.0
+
+    def _advance_head(self, new_head):
+        if new_head > self.head:
+            self._head_energy = self._energy_after(new_head - 1)
+            self.head = new_head
+
+    def append(self, chunk):
+        """Add samples at the end, dropping the oldest beyond capacity. Returns the number dropped."""
+        chunk = np.asarray(chunk, dtype=self._data.dtype)
+        dropped = 0
+        if len(chunk) > self.capacity:
+            # Only the newest `capacity` samples can be kept
+            skipped = len(chunk) - self.capacity
+            self._energy += float(np.dot(chunk[:skipped], chunk[:skipped]))
+            dropped = len(self) + skipped
+            self.head = self.tail = self.tail + skipped
+            self._head_energy = self._energy
+            chunk = chunk[skipped:]
+
+        overflow = len(self) + len(chunk) - self.capacity
+        if overflow > 0:
+            # Read the new head's energy before its slot is overwritten
+            self._advance_head(self.head + overflow)
+            dropped += overflow
+
+        written = 0
+        while written < len(chunk):
+            slot = (self.tail + written) % self.capacity
+            part = chunk[written:written + self.capacity - slot]
+            self._data[slot:slot + len(part)] = part
+            self._data[slot + self.capacity:slot + self.capacity + len(part)] = part
+            self._cum[slot:slot + len(part)] = self._energy + np.cumsum(np.square(part, dtype=np.float64))
+            self._energy = float(self._cum[slot + len(part) - 1])
+            written += len(part)
+        self.tail += len(chunk)
+        return dropped
+
+    def trim(self, count):
+        """Drop the `count` oldest samples."""
+        self._advance_head(self.head + min(max(int(count), 0), len(self)))
+
+    def trim_to(self, sample):
+        """Drop samples before absolute index `sample`."""
+        self.trim(sample - self.head)
+
+    def clear(self):
+        self.trim(len(self))
+
+    def restart_at(self, sample):
+        """Empty the buffer and continue at absolute index `sample` (skipping a gap in the stream)."""
+        self.clear()
+        self.head = self.tail = int(sample)
+        self._head_energy = self._energy
+
+    def view(self):
+        """The buffered samples, oldest first, as a view (valid until the next append)."""
+        start = self.head % self.capacity
+        return self._data[start:start + len(self)]
+
+    def rms(self):
+        if len(self) == 0:
+            return 0.0
+        return float(np.sqrt(max(self._energy - self._head_energy, 0.0) / len(self)))
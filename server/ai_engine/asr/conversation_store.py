@@ -71,6 +71,10 @@ class ConversationStore:
                 self.db_session.commit()
                 self.db_session.refresh(db_interaction)
                 interaction_id = db_interaction.id
+
+                if contact_id:
+                    from app.services.enrichment_cache import enrichment_cache
+                    enrichment_cache.invalidate(contact_id)
                 
                 print(f"✓ Saved conversation to database as interaction {interaction_id}")
             except Exception as e:
@@ -0,0 +1,267 @@
+import os
+import re
+from .audio_buffer import AudioRingBuffer
+
+# Longest uncommitted audio kept for re-decoding; past this the current hypothesis is committed as is
+ASR_STREAM_MAX_BUFFER_SECONDS = float(os.getenv("ASR_STREAM_MAX_BUFFER_SECONDS", "15"))
+# Minimum new audio between two decodes of the buffer
+ASR_STREAM_MIN_CHUNK_SECONDS = float(os.getenv("ASR_STREAM_MIN_CHUNK_SECONDS", "1.0"))
+# Final transcript: committed words below this probability are re-decoded from the session audio
+ASR_FINAL_MIN_WORD_PROBABILITY = float(os.getenv("ASR_FINAL_MIN_WORD_PROBABILITY", "0.5"))
+# Low-confidence regions longer than this keep their streaming words
+ASR_FINAL_REDECODE_MAX_SECONDS = float(os.getenv("ASR_FINAL_REDECODE_MAX_SECONDS", "8"))
+
+# Committed text passed to Whisper as the prompt for the next decode
+PROMPT_CHARS = 200
+# Audio kept after a decode that found no words, in case speech is just starting
+NO_SPEECH_KEEP_SECONDS = 2.0
+# Audio around a low-confidence word included in its re-decode (bounded by the neighbouring words)
+REDECODE_PADDING_SECONDS = 0.3
+REDECODE_BEAM_SIZE = 5
+
+def words_text(words):
+    """Join (start, end, text, probability) words into a string."""
+    return "".join(w[2] for w in words).strip()
+
+def _norm(text):
+    return re.sub(r"[^\w']", "", text.lower())
+
+class Snapshot:
+    """Copy of the uncommitted audio taken for one decode, so it can run off the event loop."""
+    def __init__(self, audio, start_sample, prompt, generation, seq, tentative=()):
+        self.audio = audio
+        self.start_sample = start_sample
+        self.prompt = prompt
+        self.generation = generation
+        self.seq = seq
+        # Tentative words at the time, used if the decode finds nothing (end_utterance)
+        self.tentative = list(tentative)
+
+def decode_snapshot(engine, snapshot):
+    """Decode a snapshot with an ASREngine (an ASREnginePool job function)."""
+    return engine.transcribe_words(snapshot.audio, initial_prompt=snapshot.prompt)
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of one live audio stream (LocalAgreement-2).
+    Only the audio after the last committed word is kept and decoded. Each
+    decode yields a word-timestamped hypothesis; the words on which it agrees
+    with the previous hypothesis are committed and the buffer is trimmed to
+    the end of the last committed word, so every second of audio is decoded
+    a few times at most instead of on every pass over a rolling window.
+    The rest of the hypothesis is tentative and may still change.
+    The uncommitted audio lives in a fixed AudioRingBuffer of twice
+    `max_buffer_seconds`; if decodes fall that far behind, the oldest audio is dropped.
+
+    process() decodes inline with `engine`. With a shared engine pool, take a
+    snapshot(), decode it elsewhere with decode_snapshot() and apply() the
+    words; results of snapshots older than one already applied, or taken
+    before a flush(), are ignored. end_utterance() and finish_utterance()
+    split a flush() the same way, so an utterance's last decode can be queued
+    while the next one streams.
+    """
+    def __init__(self, engine=None, sample_rate=16000, max_buffer_seconds=ASR_STREAM_MAX_BUFFER_SECONDS,
+                 min_chunk_seconds=ASR_STREAM_MIN_CHUNK_SECONDS):
+        self.engine = engine
+        self.sample_rate = sample_rate
+        self.max_buffer_seconds = max_buffer_seconds
+        self.min_chunk_seconds = min_chunk_seconds
+
+        self.buffer = AudioRingBuffer(int(2 * max_buffer_seconds * sample_rate))
+        self.samples_since_decode = 0
+        # Committed words with stream timestamps
+        self.committed = []
+        # Uncommitted words of the last hypothesis
+        self.tentative = []
+        # Bumped by flush(), so decodes of audio from before it are discarded
+        self.generation = 0
+        self._snapshots = 0
+        self._applied = 0
+
+    @property
+    def buffer_seconds(self):
+        return len(self.buffer) / self.sample_rate
+
+    @property
+    def buffer_offset(self):
+        """Stream time (seconds) of the first buffered sample."""
+        return self.buffer.head / self.sample_rate
+
+    def insert_audio(self, chunk, at_sample=None):
+        """
+        Add stream audio. `at_sample` is the stream index of chunk[0] when the
+        stream has gaps (only speech is passed in); earlier audio still
+        buffered at that point is flushed first.
+        """
+        if at_sample is not None and at_sample != self.buffer.tail:
+            self.flush()
+            self.buffer.restart_at(at_sample)
+        self.buffer.append(chunk)
+        self.samples_since_decode += len(chunk)
+
+    def ready(self):
+        """Enough new audio arrived since the last decode."""
+        return self.samples_since_decode >= self.min_chunk_seconds * self.sample_rate
+
+    def committed_text(self):
+        return words_text(self.committed)
+
+    def _prompt(self):
+        return words_text(self.committed)[-PROMPT_CHARS:]
+
+    def _trim(self, stream_time):
+        """Drop buffered audio before `stream_time`."""
+        self.buffer.trim_to(int(round(stream_time * self.sample_rate)))
+
+    def _drop_repeated(self, words):
+        """Whisper may repeat the last committed words at the start of a trimmed buffer."""
+        tail = [_norm(w[2]) for w in self.committed[-5:]]
+        head = [_norm(w[2]) for w in words[:5]]
+        for n in range(min(len(tail), len(head)), 0, -1):
+            if tail[-n:] == head[:n]:
+                return words[n:]
+        return words
+
+    def _commit(self, words):
+        if words:
+            self.committed.extend(words)
+            self._trim(words[-1][1])
+        return words
+
+    def snapshot(self):
+        """The uncommitted audio and prompt for one decode (the only copy of the buffer made)."""
+        self.samples_since_decode = 0
+        self._snapshots += 1
+        return Snapshot(self.buffer.view().copy(), self.buffer.head, self._prompt(), self.generation, self._snapshots)
+
+    def process(self, engine=None):
+        """
+        Decode the uncommitted buffer.
+        Returns (newly committed words, tentative words), each as
+        (start, end, text, probability) with stream timestamps.
+        """
+        snapshot = self.snapshot()
+        if len(snapshot.audio) == 0:
+            return [], self.tentative
+        return self.apply(snapshot, decode_snapshot(engine or self.engine, snapshot))
+
+    def apply(self, snapshot, words):
+        """
+        Update the hypothesis with the words decoded from `snapshot`.
+        Returns (newly committed words, tentative words), or None if the snapshot is stale.
+        """
+        if snapshot.generation != self.generation or snapshot.seq <= self._applied:
+            return None
+        self._applied = snapshot.seq
+
+        offset = snapshot.start_sample / self.sample_rate
+        words = self._drop_repeated([(s + offset, e + offset, t, p) for s, e, t, p in words])
+
+        if not words:
+            self.tentative = []
+            self._trim(offset + len(snapshot.audio) / self.sample_rate - NO_SPEECH_KEEP_SECONDS)
+            return [], []
+
+        # LocalAgreement: commit the longest prefix shared with the previous hypothesis
+        agreed = 0
+        for previous, current in zip(self.tentative, words):
+            if _norm(previous[2]) != _norm(current[2]):
+                break
+            agreed += 1
+
+        if agreed == 0 and self.buffer_seconds > self.max_buffer_seconds:
+            # No agreement for too long: commit what we have rather than grow the buffer
+            agreed = len(words)
+
+        committed = self._commit(words[:agreed])
+        self.tentative = words[agreed:]
+        return committed, self.tentative
+
+    def flush(self):
+        """Commit the tentative words (end of an utterance or of the stream) and clear the buffer."""
+        committed = self._commit(self.tentative)
+        self.tentative = []
+        self.buffer.clear()
+        self.samples_since_decode = 0
+        self.generation += 1
+        return committed
+
+    def end_utterance(self):
+        """
+        Close the current utterance without waiting for its last decode.
+        Returns a snapshot of its uncommitted audio for finish_utterance();
+        the buffer is cleared right away, so the next utterance can start
+        streaming while that decode is still queued.
+        """
+        snapshot = self.snapshot()
+        snapshot.tentative = list(self.tentative)
+        self.tentative = []
+        self.buffer.clear()
+        self.samples_since_decode = 0
+        self.generation += 1
+        return snapshot
+
+    def finish_utterance(self, snapshot, words):
+        """
+        Commit the final decode of an utterance closed by end_utterance(): all
+        of its words are final (its tentative words if the decode found none).
+        Returns the words committed.
+        """
+        offset = snapshot.start_sample / self.sample_rate
+        words = self._drop_repeated([(s + offset, e + offset, t, p) for s, e, t, p in words]) or snapshot.tentative
+        if not words:
+            return []
+        # A later utterance may have committed words already; keep stream order
+        position = len(self.committed)
+        while position > 0 and self.committed[position - 1][0] > words[0][0]:
+            position -= 1
+        self.committed[position:position] = words
+        return words
+
+    def low_confidence_regions(self, min_probability=ASR_FINAL_MIN_WORD_PROBABILITY,
+                               max_seconds=ASR_FINAL_REDECODE_MAX_SECONDS):
+        """
+        Short spans of committed words worth decoding again, as
+        (start, end, first, last): stream times and the committed[first:last]
+        words they replace. Low-probability words at most one word apart are
+        merged into one span.
+        """
+        spans = []
+        for i, word in enumerate(self.committed):
+            if word[3] >= min_probability:
+                continue
+            if spans and i - spans[-1][1] <= 1:
+                spans[-1][1] = i + 1
+            else:
+                spans.append([i, i + 1])
+
+        regions = []
+        for first, last in spans:
+            start = self.committed[first][0] - REDECODE_PADDING_SECONDS
+            if first > 0:
+                start = max(start, self.committed[first - 1][1])
+            end = self.committed[last - 1][1] + REDECODE_PADDING_SECONDS
+            if last < len(self.committed):
+                end = min(end, self.committed[last][0])
+            start = max(start, 0.0)
+            if end - start <= max_seconds:
+                regions.append((start, end, first, last))
+        return regions
+
+    def final_words(self, read_audio, engine=None):
+        """
+        Committed words for the whole stream, with low-confidence regions
+        re-decoded with a beam. `read_audio(start, end)` returns the float32
+        stream audio between two stream times (the session's backup on disk).
+        """
+        engine = engine or self.engine
+        words = list(self.committed)
+        # Back to front, so earlier indices stay valid as regions are replaced
+        for start, end, first, last in reversed(self.low_confidence_regions()):
+            audio = read_audio(start, end)
+            redecoded = engine.transcribe_words(
+                audio, initial_prompt=words_text(words[:first])[-PROMPT_CHARS:], beam_size=REDECODE_BEAM_SIZE
+            )
+            if redecoded:
+                words[first:last] = [(s + start, e + start, t, p) for s, e, t, p in redecoded]
+        return words
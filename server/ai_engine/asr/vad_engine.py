@@ -1,6 +1,17 @@
 import webrtcvad
 import collections
+import os
 import sys
+import numpy as np
+
+# Live ASR speech segmentation
+ASR_VAD_AGGRESSIVENESS = int(os.getenv("ASR_VAD_AGGRESSIVENESS", "2"))
+# 10, 20 or 30 (webrtcvad frame sizes)
+ASR_VAD_FRAME_MS = int(os.getenv("ASR_VAD_FRAME_MS", "30"))
+# Audio before the detected onset included in an utterance
+ASR_VAD_ONSET_PADDING_MS = int(os.getenv("ASR_VAD_ONSET_PADDING_MS", "300"))
+# Trailing non-speech that ends an utterance (included in it)
+ASR_VAD_OFFSET_PADDING_MS = int(os.getenv("ASR_VAD_OFFSET_PADDING_MS", "600"))
 
 class VADEngine:
     def __init__(self, aggressiveness: int = 2, sample_rate: int = 16000, frame_duration_ms: int = 30):
@@ -43,3 +54,86 @@ class Frame(object):
         self.bytes = bytes
         self.timestamp = timestamp
         self.duration = duration
+
+class SpeechSegmenter:
+    """
+    Splits a live float32 stream into utterances with webrtcvad.
+    Audio is cut into int16 frames of `frame_duration_ms`. An utterance starts
+    when `ratio` of the last onset-padding frames are speech (those frames
+    are included, so the first syllable is not clipped) and ends when `ratio`
+    of the last offset-padding frames are not. Only utterance audio is passed
+    on; silence and background noise never reach Whisper.
+    """
+    def __init__(self, vad: VADEngine = None, sample_rate: int = 16000, frame_duration_ms: int = ASR_VAD_FRAME_MS,
+                 onset_padding_ms: int = ASR_VAD_ONSET_PADDING_MS, offset_padding_ms: int = ASR_VAD_OFFSET_PADDING_MS,
+                 ratio: float = 0.9):
+        if frame_duration_ms not in (10, 20, 30):
+            raise ValueError(f"VAD frame duration must be 10, 20 or 30 ms, got {frame_duration_ms}")
+        self.vad = vad or VADEngine(ASR_VAD_AGGRESSIVENESS, sample_rate, frame_duration_ms)
+        self.sample_rate = sample_rate
+        self.frame_duration_ms = frame_duration_ms
+        self.frame_samples = sample_rate * frame_duration_ms // 1000
+        self.ratio = ratio
+        # Frames before an onset: (Frame, float32 samples, is_speech)
+        self.onset = collections.deque(maxlen=max(1, onset_padding_ms // frame_duration_ms))
+        # Speech flags of the latest frames inside an utterance
+        self.offset = collections.deque(maxlen=max(1, offset_padding_ms // frame_duration_ms))
+        self.in_speech = False
+        # Utterances started so far (0 = the stream held no speech)
+        self.utterances = 0
+        # Samples short of a whole frame, and the stream index of the first one
+        self.pending = np.empty(0, dtype=np.float32)
+        self.position = 0
+
+    def feed(self, chunk: np.ndarray):
+        """
+        Add stream audio. Returns events in stream order:
+          ("speech", start_sample, samples) for utterance audio
+          ("end", sample, None) when an utterance ends
+        Sample indices count every sample fed, so they line up with the raw session audio.
+        """
+        audio = np.concatenate([self.pending, chunk]) if len(self.pending) else chunk
+        usable = len(audio) - len(audio) % self.frame_samples
+        frames = audio[:usable].reshape(-1, self.frame_samples)
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+
+        events = []
+        run_start, run = None, []
+
+        def emit_run():
+            if run:
+                events.append(("speech", run_start, np.concatenate(run)))
+
+        for i, samples in enumerate(frames):
+            start = self.position + i * self.frame_samples
+            frame = Frame(pcm[i].tobytes(), start / self.sample_rate, self.frame_duration_ms / 1000.0)
+            speech = self.vad.is_speech(frame.bytes)
+
+            if not self.in_speech:
+                self.onset.append((frame, samples, speech))
+                if sum(s for _, _, s in self.onset) >= self.ratio * self.onset.maxlen:
+                    self.in_speech = True
+                    self.utterances += 1
+                    run_start = int(round(self.onset[0][0].timestamp * self.sample_rate))
+                    run = [s for _, s, _ in self.onset]
+                    self.onset.clear()
+                    self.offset.clear()
+                continue
+
+            if not run:
+                run_start = start
+            run.append(samples)
+            self.offset.append(speech)
+            if len(self.offset) - sum(self.offset) >= self.ratio * self.offset.maxlen:
+                self.in_speech = False
+                emit_run()
+                run_start, run = None, []
+                events.append(("end", start + self.frame_samples, None))
+                self.offset.clear()
+
+        if self.in_speech:
+            emit_run()
+
+        self.pending = audio[usable:].copy()
+        self.position += usable
+        return events
@@ -1,10 +1,13 @@
-import insightface
 from insightface.app import FaceAnalysis
-import cv2
+from insightface.app.common import Face
+from insightface.utils import face_align
 import numpy as np
+import hashlib
 import json
 import os
 import sys
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Add parent directory to path to import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,14 +20,45 @@ except ImportError:
     sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
     from app.chroma_client import get_face_collection
 
-def load_models():
+from .face_gallery import gallery_index
+from .face_scheduler import get_inference_scheduler, InferenceQueueFull
+from .face_workers import get_worker_pool
+from .image_decode import as_decoded, decode_frame, FULL_RES_EMBED_MIN_FACE
+from .face_quality import quality_gate
+from .ort_tuning import OrtSessionConfig
+from .face_quantize import apply_precision, FACE_MODEL_PRECISION
+
+# Strict confidence filtering for cleanliness
+# Buffalo_S might be slightly noisier, so we keep a reasonable threshold
+MIN_DET_SCORE = 0.5
+
+# Base cosine similarity for a match (higher = stricter); per-contact thresholds adapt around it
+FACE_RECOGNITION_THRESHOLD = float(os.getenv("FACE_RECOGNITION_THRESHOLD", "0.45"))
+
+# Threads decoding and detecting enrollment photos in parallel
+FACE_ENROLL_THREADS = int(os.getenv("FACE_ENROLL_THREADS", "4"))
+
+# Contacts fetched, embedded and upserted together by sync_embeddings_from_db
+SYNC_BATCH_SIZE = int(os.getenv("FACE_SYNC_BATCH_SIZE", "64"))
+# Last synced contact id, so an interrupted sync can resume
+# Resolves to server/data/face_sync_checkpoint.json
+SYNC_CHECKPOINT_PATH = os.getenv("FACE_SYNC_CHECKPOINT") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "face_sync_checkpoint.json"
+)
+
+def load_models(session_config=None, precision=None):
     """
     Load the RetinaFace and ArcFace models.
     Optimized for real-time multi-face detection with maximum performance using 'buffalo_s'.
+    ONNX Runtime sessions use `session_config` (default: FACE_ORT_* settings) and
+    `precision` picks fp32 or cached INT8 models (default: FACE_MODEL_PRECISION).
     """
     # This provides a ~3x speedup with minimal accuracy loss for close-range faces
     # CoreML disabled due to shape mismatch errors on some MacOS versions
-    app = FaceAnalysis(name="buffalo_s", providers=['CPUExecutionProvider'])
+    # Only the detector and ArcFace are used; skip landmark and gender/age models in the pack
+    app = FaceAnalysis(name="buffalo_s", providers=['CPUExecutionProvider'], allowed_modules=['detection', 'recognition'])
+    apply_precision(app, precision or FACE_MODEL_PRECISION)
+    (session_config or OrtSessionConfig.for_process()).apply_to(app)
     
     # Use (320, 320) - slightly larger than 224 for better detection of small faces but still very fast
     app.prepare(ctx_id=0, det_size=(320, 320))
@@ -33,170 +67,435 @@ def load_models():
 def detect_and_embed(app, image):
     """
     Detect all faces and return their embedding vectors.
-    Optimized for real-time performance.
+    Optimized for real-time performance: only the detector and the
+    recognizer run, and embeddings go through the shared batching scheduler.
+    Runs on the face worker pool when FACE_WORKERS is set.
     """
-    if image is None:
-        return []
-    
-    # Ensure image is in correct format
-    # Simple check for efficiency
-    if getattr(image, 'ndim', 0) != 3:
-        return []
-    
-    # Direct detection
-    # Using the smaller model allows for faster inference
-    faces = app.get(image)
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.detect_and_embed(image)
+
+    faces = detect_faces(app, image)
     
     if len(faces) == 0:
         return []
     
+    embed_faces(app, image, faces)
+    
     results = []
     for face in faces:
         results.append({
             "embedding": face.embedding.tolist(),
             "bbox": face.bbox.tolist(),
-            "det_score": float(face.det_score) if hasattr(face, "det_score") else 1.0
+            "det_score": float(face.det_score)
         })
     
     return results
 
-def recognize_face(app, image, threshold=0.45, user_id=None):
+def detect_faces(app, image):
     """
-    Compare input face embeddings to stored embeddings using ChromaDB.
-    Returns a list of recognition results sorted by confidence.
+    Run only the face detector.
+    Returns insightface Face objects carrying bbox, kps and det_score but no embedding.
     """
-    # Detect faces
-    detected_faces = detect_and_embed(app, image)
-    
-    if not detected_faces:
+    if image is None or getattr(image, 'ndim', 0) != 3:
         return []
 
-    # Strict confidence filtering for cleanliness
-    # Buffalo_S might be slightly noisier, so we keep a reasonable threshold
-    MIN_DET_SCORE = 0.5 
-    detected_faces = [f for f in detected_faces if f.get("det_score", 0) >= MIN_DET_SCORE]
-    
-    if not detected_faces:
-        return []
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.detect_faces(image)
+
+    bboxes, kpss = app.det_model.detect(image, max_num=0, metric='default')
+
+    faces = []
+    for i in range(bboxes.shape[0]):
+        faces.append(Face(
+            bbox=bboxes[i, 0:4],
+            kps=kpss[i] if kpss is not None else None,
+            det_score=bboxes[i, 4]
+        ))
+    return faces
+
+def embed_faces(app, image, faces):
+    """
+    Compute ArcFace embeddings for already-detected faces.
+    Crops are aligned on the calling thread, then batched with crops from
+    other sessions by the shared inference scheduler.
+    Sets `face.embedding` in place and returns the faces.
+    Raises InferenceQueueFull when the scheduler is overloaded.
+    """
+    if not faces:
+        return faces
+
+    pool = get_worker_pool()
+    if pool is not None:
+        for face, embedding in zip(faces, pool.embed_faces(image, faces)):
+            face.embedding = embedding
+        return faces
+
+    scheduler = get_inference_scheduler(app)
+    image_size = scheduler.rec_model.input_size[0]
+    crops = [face_align.norm_crop(image, landmark=face.kps, image_size=image_size) for face in faces]
+    embeddings = scheduler.embed(crops)
+    for face, embedding in zip(faces, embeddings):
+        face.embedding = embedding.flatten()
+    return faces
+
+def detect_decoded(app, frame, detect_image=None):
+    """
+    Detect faces on a DecodedFrame's (possibly reduced) image and return
+    them in original-resolution coordinates.
+    `detect_image` lets the caller pass a shared-memory staged copy of frame.image.
+    """
+    faces = detect_faces(app, frame.image if detect_image is None else detect_image)
+    if frame.scale != 1:
+        for face in faces:
+            face.bbox = face.bbox * frame.scale
+            if face.kps is not None:
+                face.kps = face.kps * frame.scale
+    return faces
 
-    # Get ChromaDB collection
+def embed_decoded(app, frame, faces, embed_image=None):
+    """
+    Embed faces given in original-resolution coordinates.
+    Large faces are aligned on the reduced image; faces too small for a clean
+    112x112 crop there are aligned on the full-resolution decode instead.
+    """
+    if frame.scale == 1:
+        return embed_faces(app, frame.image if embed_image is None else embed_image, faces)
+
+    small = [f for f in faces if (f.bbox[2] - f.bbox[0]) / frame.scale < FULL_RES_EMBED_MIN_FACE]
+    large = [f for f in faces if (f.bbox[2] - f.bbox[0]) / frame.scale >= FULL_RES_EMBED_MIN_FACE]
+
+    if large:
+        reduced = [Face(bbox=f.bbox / frame.scale, kps=f.kps / frame.scale, det_score=f.det_score) for f in large]
+        embed_faces(app, frame.image if embed_image is None else embed_image, reduced)
+        for face, scaled in zip(large, reduced):
+            face.embedding = scaled.embedding
+    if small:
+        embed_faces(app, frame.full(), small)
+    return faces
+
+def _largest_face(faces):
+    return max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+
+def _aligned_crop(frame, face, image_size):
+    """ArcFace crop of an original-coordinate face, from the reduced image when it is large enough."""
+    if frame.scale == 1 or (face.bbox[2] - face.bbox[0]) / frame.scale >= FULL_RES_EMBED_MIN_FACE:
+        return face_align.norm_crop(frame.image, landmark=face.kps / frame.scale, image_size=image_size)
+    return face_align.norm_crop(frame.full(), landmark=face.kps, image_size=image_size)
+
+def embed_photos(app, photos):
+    """
+    Embed the largest face of each encoded photo, for enrollment.
+    Photos are decoded (at reduced resolution) and detected in parallel threads;
+    the aligned crops of all photos then go through ArcFace in a single batch.
+    With the worker pool, each photo is embedded on the pool instead, so the
+    work spreads across the worker processes.
+    Returns a list aligned with `photos`: an embedding list, or None when the
+    photo could not be decoded or has no face.
+    """
+    pool = get_worker_pool()
+    image_size = None if pool is not None else app.models['recognition'].input_size[0]
+
+    def prepare(data):
+        frame = decode_frame(data) if data else None
+        if frame is None:
+            return None
+        faces = detect_decoded(app, frame)
+        if not faces:
+            return None
+        face = _largest_face(faces)
+        if pool is not None:
+            embed_decoded(app, frame, [face])
+            return face.embedding
+        return _aligned_crop(frame, face, image_size)
+
+    with ThreadPoolExecutor(max_workers=min(FACE_ENROLL_THREADS, max(1, len(photos)))) as executor:
+        prepared = list(executor.map(prepare, photos))
+
+    if pool is None:
+        indices = [i for i, crop in enumerate(prepared) if crop is not None]
+        embeddings = get_inference_scheduler(app).embed([prepared[i] for i in indices]) if indices else []
+        for i, embedding in zip(indices, embeddings):
+            prepared[i] = embedding
+
+    return [None if e is None else np.asarray(e, dtype=np.float32).flatten().tolist() for e in prepared]
+
+def unknown_identity():
+    return {"name": "Unknown", "relation": "Unidentified Person", "confidence": 0.0}
+
+def match_identities(embeddings, threshold=FACE_RECOGNITION_THRESHOLD, user_id=None):
+    """
+    Match embeddings against the user's in-memory face gallery.
+    Returns one identity dict (name, relation, confidence, contact_id) per embedding.
+    Raises if the gallery cannot be loaded from ChromaDB.
+    """
+    # Only touches ChromaDB on first use or after expiry
+    gallery = gallery_index.get(user_id)
+    best_index, best_similarity = gallery.match(embeddings)
+    # `threshold` is the base; each contact's own threshold adapts to its gallery statistics
+    limits = gallery.thresholds_for(best_index, threshold)
+
+    identities = []
+    for idx, similarity, limit in zip(best_index, best_similarity, limits):
+        # Buffalo_S produces slightly different embedding space
+        # 0.45 (the FACE_RECOGNITION_THRESHOLD default) is a good safe base threshold
+        if idx >= 0 and similarity > limit:
+            metadata = gallery.metadatas[idx]
+            identities.append({
+                "name": metadata["name"],
+                "relation": metadata["relation"],
+                "confidence": float(similarity),
+                "contact_id": metadata.get("contact_id")
+            })
+        else:
+            identities.append(unknown_identity())
+    return identities
+
+@contextmanager
+def staged_frame(image):
+    """
+    Stage a frame in the worker pool's shared memory for the duration of the block
+    so detection and embedding reuse one copy. Yields the image itself without a pool.
+    """
+    pool = get_worker_pool()
+    staged = pool.stage(image) if pool is not None else image
     try:
-        collection = get_face_collection()
-        if collection.count() == 0:
-            return [{
-                "name": "Unknown", 
-                "relation": "Unidentified Person", 
-                "confidence": 0.0,
-                "bbox": f["bbox"],
-                "det_score": f["det_score"]
-            } for f in detected_faces]
-    except:
-        return []
+        yield staged
+    finally:
+        if staged is not image:
+            staged.release()
 
-    results = []
-    where_filter = {"user_id": user_id} if user_id else None
+def recognize_face(app, image, threshold=FACE_RECOGNITION_THRESHOLD, user_id=None):
+    """
+    Compare input face embeddings to the user's in-memory face gallery.
+    `image` is a BGR array or a DecodedFrame from image_decode.decode_frame.
+    Only faces that pass the quality gate (size, pose, sharpness) are run
+    through ArcFace; the rest come back as Unknown. All embedded faces are matched with one matrix
+    multiply against a gallery kept in sync by the contact sync functions.
+    Returns a list of recognition results sorted by confidence.
+    """
+    frame = as_decoded(image)
 
-    # Batch query could be implemented here but sequential is fast enough for 1-3 faces
-    for face_data in detected_faces:
-        current_emb = face_data["embedding"]
-        current_bbox = face_data["bbox"]
-        
+    with staged_frame(frame.image) as staged:
+        faces = [f for f in detect_decoded(app, frame, staged) if float(f.det_score) >= MIN_DET_SCORE]
+        if not faces:
+            return []
+
+        # Small, blurred and profile faces are not worth an ArcFace pass
+        embeddable = [i for i, f in enumerate(faces) if quality_gate.passes(frame.image, f, frame.scale)]
+        embed_decoded(app, frame, [faces[i] for i in embeddable], staged)
+
+    identities = [unknown_identity() for _ in faces]
+    if embeddable:
         try:
-            # Query top 1
-            query_result = collection.query(
-                query_embeddings=[current_emb],
-                n_results=1,
-                where=where_filter
-            )
-            
-            match_found = False
-            if query_result and query_result['ids'] and len(query_result['ids'][0]) > 0:
-                distance = query_result['distances'][0][0]
-                similarity = 1.0 - distance
-                
-                # Buffalo_S produces slightly different embedding space
-                # 0.45 is a good safe threshold
-                if similarity > threshold:
-                    metadata = query_result['metadatas'][0][0]
-                    results.append({
-                        "name": metadata["name"],
-                        "relation": metadata["relation"],
-                        "confidence": float(similarity),
-                        "bbox": current_bbox,
-                        "det_score": face_data["det_score"],
-                        "contact_id": metadata.get("contact_id")
-                    })
-                    match_found = True
-            
-            if not match_found:
-                results.append({
-                    "name": "Unknown", 
-                    "relation": "Unidentified Person", 
-                    "confidence": 0.0,
-                    "bbox": current_bbox,
-                    "det_score": face_data["det_score"]
-                })
-                
+            matched = match_identities([faces[i].embedding for i in embeddable], threshold, user_id)
         except Exception as e:
             print(f"Recog error: {e}")
-            results.append({
-                "name": "Unknown", "relation": "Error", "confidence": 0, "bbox": current_bbox
-            })
+            return []
+        for i, identity in zip(embeddable, matched):
+            identities[i] = identity
+
+    results = []
+    for face, identity in zip(faces, identities):
+        results.append({
+            **identity,
+            "bbox": face.bbox.tolist(),
+            "det_score": float(face.det_score)
+        })
 
     # Sort results
     results.sort(key=lambda x: x.get("confidence", 0), reverse=True)
     return results
 
-def sync_embeddings_from_db(app, db_session):
+def recognize_tracked(app, image, tracker, threshold=FACE_RECOGNITION_THRESHOLD, user_id=None):
+    """
+    Streaming variant of recognize_face for a single connection.
+    Detection runs every frame, but faces that keep their track reuse the
+    track's identity and are only re-embedded when the tracker asks for it
+    and the face passes the quality gate. Each match is a vote; a track
+    reports Unknown until an identity locks, then keeps it until another
+    identity wins the vote.
+    `image` is a BGR array or a DecodedFrame. Results carry a stable `track_id`
+    and whether the track's identity is `locked`.
+    """
+    frame = as_decoded(image)
+
+    # With a worker pool, the frame is staged in shared memory once for detection and embedding
+    with staged_frame(frame.image) as staged:
+        faces = [f for f in detect_decoded(app, frame, staged) if float(f.det_score) >= MIN_DET_SCORE]
+        tracks = tracker.update([f.bbox for f in faces])
+
+        if not tracks:
+            return []
+
+        pending = [
+            i for i, track in enumerate(tracks)
+            if tracker.needs_embedding(track) and quality_gate.passes(frame.image, faces[i], frame.scale)
+        ]
+        if pending:
+            try:
+                embed_decoded(app, frame, [faces[i] for i in pending], staged)
+            except InferenceQueueFull:
+                # Overloaded: keep tracked identities and retry on a later frame
+                pending = []
+
+    if pending:
+        try:
+            identities = match_identities([faces[i].embedding for i in pending], threshold, user_id)
+        except Exception as e:
+            print(f"Recog error: {e}")
+            return []
+        for i, identity in zip(pending, identities):
+            tracker.set_identity(tracks[i], identity)
+
+    results = []
+    for face, track in zip(faces, tracks):
+        results.append({
+            **(track.identity or unknown_identity()),
+            "bbox": face.bbox.tolist(),
+            "det_score": float(face.det_score),
+            "track_id": track.track_id,
+            "locked": track.locked
+        })
+
+    results.sort(key=lambda x: x.get("confidence", 0), reverse=True)
+    return results
+
+def photo_hash(photo):
+    """Content hash stored with synced embeddings; matches PostgreSQL md5() of the bytea."""
+    return hashlib.md5(photo).hexdigest()
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(json.load(f).get("last_contact_id", 0))
+    except (OSError, ValueError, TypeError):
+        return 0
+
+def _write_checkpoint(path, last_contact_id):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"last_contact_id": last_contact_id}, f)
+    os.replace(tmp_path, path)
+
+def sync_embeddings_from_db(app, db_session, resume=True, batch_size=SYNC_BATCH_SIZE, checkpoint_path=SYNC_CHECKPOINT_PATH):
     """
     Sync face embeddings from database contacts with profile photos.
+    Contacts are streamed in id order with a server-side cursor, and only the
+    photo's md5 (computed by the database) is read at first; photos whose hash
+    matches the one stored in ChromaDB are not fetched or embedded again, and
+    only have their metadata rewritten if the name, relation or owner changed
+    (contact edits do not touch ChromaDB). Changed photos are fetched, embedded and upserted one batch at a
+    time, and the last finished contact id is checkpointed so an interrupted
+    run resumes where it stopped (pass resume=False to start over).
     """
     from app.models import Contact
-    
-    contacts = db_session.query(Contact).filter(
-        Contact.profile_photo.isnot(None),
-        Contact.is_active == True
-    ).all()
+    from sqlalchemy import func
     
     try:
         collection = get_face_collection()
     except Exception as e:
         return {"success": False, "error": str(e)}
     
-    ids = []
-    embeddings = []
-    metadatas = []
+    start_after = _read_checkpoint(checkpoint_path) if resume else 0
+    if start_after:
+        print(f"Resuming face sync after contact {start_after}")
+    
+    rows = db_session.query(
+        Contact.id,
+        Contact.name,
+        Contact.relationship,
+        Contact.relationship_detail,
+        Contact.user_id,
+        func.md5(Contact.profile_photo).label("photo_hash")
+    ).filter(
+        Contact.profile_photo.isnot(None),
+        Contact.is_active == True,
+        Contact.id > start_after
+    ).order_by(Contact.id).execution_options(stream_results=True).yield_per(batch_size)
+    
+    stats = {"count": 0, "skipped": 0, "failed": 0}
+    
+    def row_metadata(row):
+        return {
+            "name": row.name,
+            "relation": row.relationship_detail or row.relationship,
+            "contact_id": row.id,
+            "user_id": row.user_id,
+            "photo_hash": row.photo_hash
+        }
     
-    for contact in contacts:
-        if not contact.profile_photo: continue
-            
-        nparr = np.frombuffer(contact.profile_photo, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    def sync_batch(batch):
+        ids = [f"contact_{row.id}" for row in batch]
+        existing = collection.get(ids=ids, include=["metadatas", "embeddings"])
+        existing_embeddings = existing.get("embeddings")
+        if existing_embeddings is None:
+            existing_embeddings = [None] * len(existing.get("ids") or [])
+        stored = {
+            id_: (metadata or {}, embedding)
+            for id_, metadata, embedding in zip(existing.get("ids") or [], existing.get("metadatas") or [], existing_embeddings)
+        }
         
-        if img is None: continue
+        changed, relabel = [], []
+        for row in batch:
+            metadata, embedding = stored.get(f"contact_{row.id}", ({}, None))
+            if metadata.get("photo_hash") != row.photo_hash or embedding is None:
+                changed.append(row)
+            elif any(metadata.get(key) != value for key, value in row_metadata(row).items()):
+                relabel.append((row, embedding, metadata.get("user_id")))
+        stats["skipped"] += len(batch) - len(changed)
         
-        # Detect
-        # Note: We must use the same model (app) as used for recognition
-        faces = app.get(img)
-        if not faces:
-            print(f"Warning: No face found in profile photo for {contact.name}")
-            continue
-            
-        # Take largest face (assuming profile photo has main subject largest)
-        faces.sort(key=lambda x: (x.bbox[2]-x.bbox[0]) * (x.bbox[3]-x.bbox[1]), reverse=True)
-        face = faces[0]
+        if relabel:
+            # Same photo, edited contact: keep the embedding, rewrite the metadata
+            ids = [f"contact_{row.id}" for row, _, _ in relabel]
+            embeddings = [np.asarray(embedding, dtype=np.float32).tolist() for _, embedding, _ in relabel]
+            metadatas = [row_metadata(row) for row, _, _ in relabel]
+            collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+            for row, _, old_user_id in relabel:
+                if old_user_id != row.user_id:
+                    # Moved to another user: the old owner's gallery must drop it
+                    gallery_index.invalidate(old_user_id)
+            gallery_index.upsert(ids, embeddings, metadatas)
+        if not changed:
+            return
         
-        ids.append(f"contact_{contact.id}")
-        embeddings.append(face.embedding.tolist())
-        metadatas.append({
-            "name": contact.name,
-            "relation": contact.relationship_detail or contact.relationship,
-            "contact_id": contact.id,
-            "user_id": contact.user_id
-        })
+        # Fetch photo bytes only for contacts that need re-embedding
+        photos = dict(db_session.query(Contact.id, Contact.profile_photo).filter(
+            Contact.id.in_([row.id for row in changed])
+        ).all())
+        # Largest face of each photo; decoding and detection run in parallel, ArcFace once per batch
+        embedded = embed_photos(app, [photos.get(row.id) or b"" for row in changed])
+        
+        ids, embeddings, metadatas = [], [], []
+        for row, embedding in zip(changed, embedded):
+            if embedding is None:
+                print(f"Warning: No face found in profile photo for {row.name}")
+                stats["failed"] += 1
+                continue
+            ids.append(f"contact_{row.id}")
+            embeddings.append(embedding)
+            metadatas.append(row_metadata(row))
+        
+        if ids:
+            collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+            gallery_index.upsert(ids, embeddings, metadatas)
+            stats["count"] += len(ids)
+    
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            sync_batch(batch)
+            _write_checkpoint(checkpoint_path, batch[-1].id)
+            batch = []
+    if batch:
+        sync_batch(batch)
+    
+    # Finished: the next run starts from the beginning again (unchanged photos are skipped)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
     
-    if ids:
-        collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
-        return {"success": True, "count": len(ids)}
-    else:
-        return {"success": True, "count": 0}
+    print(f"Face sync: {stats['count']} embedded, {stats['skipped']} photos unchanged, {stats['failed']} without a face")
+    return {"success": True, **stats}
@@ -0,0 +1,338 @@
+import os
+import threading
+import time
+import numpy as np
+
+# Galleries are reloaded from ChromaDB after this many seconds so writes made
+# by other processes (e.g. sync_faces.py) are eventually picked up
+GALLERY_MAX_AGE = float(os.getenv("FACE_GALLERY_MAX_AGE", "300"))
+# Enrollment photos whose embedding is at least this similar to one already kept are dropped
+FACE_ENROLL_DUPLICATE_SIMILARITY = float(os.getenv("FACE_ENROLL_DUPLICATE_SIMILARITY", "0.92"))
+# Refine against per-photo vectors when the runner-up contact centroid is within this margin
+FACE_CENTROID_MARGIN = float(os.getenv("FACE_CENTROID_MARGIN", "0.05"))
+# Per-contact open-set thresholds derived from the user's gallery
+FACE_ADAPTIVE_THRESHOLDS = os.getenv("FACE_ADAPTIVE_THRESHOLDS", "true").lower() == "true"
+# A match must beat the contact's most similar other contact by this much
+FACE_THRESHOLD_IMPOSTOR_MARGIN = float(os.getenv("FACE_THRESHOLD_IMPOSTOR_MARGIN", "0.1"))
+# Largest loosening below the base threshold for contacts whose photos vary a lot
+FACE_THRESHOLD_MAX_RELAX = float(os.getenv("FACE_THRESHOLD_MAX_RELAX", "0.05"))
+# Upper bound for any per-contact threshold
+FACE_THRESHOLD_MAX = float(os.getenv("FACE_THRESHOLD_MAX", "0.7"))
+# impostor_key of a contact with no other contact to compare with
+NO_KEY = -1
+EMBEDDING_DIM = 512
+
+def normalize_rows(embeddings):
+    """L2-normalize a (N, D) array of embeddings into a contiguous float32 matrix."""
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def drop_near_duplicates(embeddings, threshold=FACE_ENROLL_DUPLICATE_SIMILARITY):
+    """
+    Greedily keep embeddings that are not near-duplicates of an earlier kept one.
+    Returns the indices of the kept embeddings, in order.
+    """
+    if len(embeddings) == 0:
+        return []
+    matrix = normalize_rows(embeddings)
+    similarities = matrix @ matrix.T
+    kept = []
+    for i in range(len(matrix)):
+        if not kept or similarities[i, kept].max() < threshold:
+            kept.append(i)
+    return kept
+
+class FaceGallery:
+    """
+    Immutable snapshot of one user's enrolled faces.
+    `embeddings` is a contiguous float32 (N, 512) matrix of L2-normalized vectors,
+    `metadatas` the matching ChromaDB metadata dicts.
+    `centroids` holds one normalized mean vector per contact, built from that
+    contact's photo vectors, so matching searches contacts rather than photos.
+    Per contact it also keeps the similarity to the nearest other contact
+    (`impostor`) and the spread of its own photos (`spread`), which set that
+    contact's acceptance threshold.
+    Patching returns a new gallery so readers never see a half-updated matrix;
+    the per-contact statistics are carried over and only recomputed where the
+    patched contacts can affect them.
+    """
+    def __init__(self, ids=None, embeddings=None, metadatas=None):
+        self.ids = list(ids or [])
+        self.embeddings = normalize_rows(embeddings) if self.ids else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.metadatas = np.array(list(metadatas or []) or [], dtype=object)
+        self.contact_ids = np.array([m.get("contact_id", -1) for m in self.metadatas], dtype=np.int64)
+        self.loaded_at = time.monotonic()
+        self._build_centroids()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build_centroids(self, previous=None, changed_keys=()):
+        # Entries without a contact_id (legacy) each form their own group
+        keys = np.where(self.contact_ids >= 0, self.contact_ids, -2 - np.arange(len(self.contact_ids)))
+        groups, first_row, self.row_groups = np.unique(keys, return_index=True, return_inverse=True)
+        self.group_keys = groups
+        sums = np.zeros((len(groups), EMBEDDING_DIM), dtype=np.float32)
+        np.add.at(sums, self.row_groups, self.embeddings)
+        self.centroids = normalize_rows(sums) if len(groups) else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        # A representative row per group, for its metadata
+        self.centroid_rows = first_row
+        # Rows of each group, for the refinement stage
+        order = np.argsort(self.row_groups, kind="stable")
+        self.group_rows = np.split(order, np.cumsum(np.bincount(self.row_groups, minlength=len(groups)))[:-1])
+        self._build_statistics(previous, changed_keys)
+
+    def _build_statistics(self, previous=None, changed_keys=()):
+        """
+        Per-contact statistics behind the adaptive thresholds.
+        `spread` is recomputed in full (one pass over the photos); the nearest
+        impostor needs contact-by-contact similarities, so after a patch only
+        the changed contacts and those whose nearest impostor changed are
+        recomputed against everyone, and the rest are only compared with the
+        changed contacts.
+        """
+        count = len(self.centroids)
+
+        # Intra-contact spread: std of each photo's similarity to its own centroid
+        if len(self):
+            row_sims = np.einsum("ij,ij->i", self.embeddings, self.centroids[self.row_groups])
+        else:
+            row_sims = np.empty(0, dtype=np.float32)
+        photos = np.maximum(np.bincount(self.row_groups, minlength=count), 1)
+        mean = np.bincount(self.row_groups, weights=row_sims, minlength=count) / photos
+        mean_sq = np.bincount(self.row_groups, weights=row_sims ** 2, minlength=count) / photos
+        self.spread = np.sqrt(np.maximum(mean_sq - mean ** 2, 0.0)).astype(np.float32)
+
+        # Inter-contact: similarity to the nearest other contact's centroid
+        self.impostor = np.full(count, -1.0, dtype=np.float32)
+        self.impostor_key = np.full(count, NO_KEY, dtype=np.int64)
+        if count < 2:
+            return
+
+        stale = np.ones(count, dtype=bool)
+        if previous is not None and len(previous.centroids):
+            carried = {
+                key: (similarity, neighbour)
+                for key, similarity, neighbour in zip(previous.group_keys, previous.impostor, previous.impostor_key)
+                if key >= 0 and neighbour >= 0
+            }
+            changed = set(int(k) for k in changed_keys)
+            live = set(self.group_keys.tolist())
+            for g, key in enumerate(self.group_keys.tolist()):
+                entry = carried.get(key)
+                if entry is not None and key not in changed and entry[1] not in changed and entry[1] in live:
+                    self.impostor[g], self.impostor_key[g] = entry
+                    stale[g] = False
+
+            # Carried-over contacts may now have a changed contact as their nearest impostor
+            changed_groups = np.flatnonzero(np.isin(self.group_keys, list(changed)))
+            kept = np.flatnonzero(~stale)
+            if len(changed_groups) and len(kept):
+                sims = self.centroids[kept] @ self.centroids[changed_groups].T
+                nearest = sims.argmax(axis=1)
+                best = sims[np.arange(len(kept)), nearest]
+                closer = best > self.impostor[kept]
+                self.impostor[kept[closer]] = best[closer]
+                self.impostor_key[kept[closer]] = self.group_keys[changed_groups[nearest[closer]]]
+
+        rows = np.flatnonzero(stale)
+        if len(rows):
+            sims = self.centroids[rows] @ self.centroids.T
+            sims[np.arange(len(rows)), rows] = -np.inf
+            nearest = sims.argmax(axis=1)
+            self.impostor[rows] = sims[np.arange(len(rows)), nearest]
+            self.impostor_key[rows] = self.group_keys[nearest]
+
+    def contact_thresholds(self, base_threshold):
+        """
+        Acceptance threshold per contact (aligned with `centroids`).
+        Contacts with a look-alike in the gallery need to beat it by
+        FACE_THRESHOLD_IMPOSTOR_MARGIN; contacts whose photos vary get up to
+        FACE_THRESHOLD_MAX_RELAX of leeway below the base threshold.
+        """
+        if not FACE_ADAPTIVE_THRESHOLDS:
+            return np.full(len(self.centroids), base_threshold, dtype=np.float32)
+        thresholds = np.maximum(base_threshold, self.impostor + FACE_THRESHOLD_IMPOSTOR_MARGIN)
+        thresholds = thresholds - np.minimum(self.spread, FACE_THRESHOLD_MAX_RELAX)
+        return np.clip(thresholds, base_threshold - FACE_THRESHOLD_MAX_RELAX, max(base_threshold, FACE_THRESHOLD_MAX))
+
+    def thresholds_for(self, best_index, base_threshold):
+        """Threshold to apply to each match returned by match()."""
+        best_index = np.asarray(best_index)
+        thresholds = np.full(len(best_index), base_threshold, dtype=np.float32)
+        found = best_index >= 0
+        if found.any():
+            thresholds[found] = self.contact_thresholds(base_threshold)[self.row_groups[best_index[found]]]
+        return thresholds
+
+    def match(self, query_embeddings, margin=FACE_CENTROID_MARGIN):
+        """
+        Find the nearest enrolled contact for every query embedding.
+        Stage one scores each query against the contact centroids with one matrix
+        multiply. Only when the runner-up centroid is within `margin` of the best
+        are the per-photo vectors of those close contacts compared, and the best
+        single photo decides.
+        Returns (best_index, best_similarity) arrays aligned with the queries;
+        best_index is a row of `metadatas`.
+        """
+        queries = normalize_rows(query_embeddings)
+        if len(self) == 0 or len(queries) == 0:
+            return np.full(len(queries), -1), np.zeros(len(queries), dtype=np.float32)
+
+        rows = np.arange(len(queries))
+        similarities = queries @ self.centroids.T
+        best_group = similarities.argmax(axis=1)
+        best_similarity = similarities[rows, best_group]
+        best_index = self.centroid_rows[best_group]
+
+        if len(self.centroids) < 2 or len(self.centroids) == len(self):
+            # One contact, or one photo per contact: centroids are the photos
+            return best_index, best_similarity
+
+        runner_up = np.partition(similarities, -2, axis=1)[:, -2]
+        for q in np.flatnonzero(best_similarity - runner_up < margin):
+            close = np.flatnonzero(similarities[q] >= best_similarity[q] - margin)
+            candidates = np.concatenate([self.group_rows[g] for g in close])
+            photo_similarities = self.embeddings[candidates] @ queries[q]
+            best = photo_similarities.argmax()
+            best_index[q] = candidates[best]
+            best_similarity[q] = photo_similarities[best]
+        return best_index, best_similarity
+
+    def upserted(self, ids, embeddings, metadatas):
+        """Return a copy with the given entries inserted or replaced."""
+        replaced = set(ids)
+        keep = [i for i, existing in enumerate(self.ids) if existing not in replaced]
+        gallery = FaceGallery()
+        gallery.ids = [self.ids[i] for i in keep] + list(ids)
+        gallery.embeddings = np.ascontiguousarray(np.vstack([self.embeddings[keep], normalize_rows(embeddings)]))
+        gallery.metadatas = np.concatenate([self.metadatas[keep], np.array(list(metadatas), dtype=object)])
+        gallery.contact_ids = np.array([m.get("contact_id", -1) for m in gallery.metadatas], dtype=np.int64)
+        gallery.loaded_at = self.loaded_at
+        gallery._build_centroids(self, [m.get("contact_id", -1) for m in metadatas])
+        return gallery
+
+    def without_contact(self, contact_id):
+        """Return a copy with every embedding of `contact_id` removed."""
+        keep = np.flatnonzero(self.contact_ids != contact_id)
+        gallery = FaceGallery()
+        gallery.ids = [self.ids[i] for i in keep]
+        gallery.embeddings = np.ascontiguousarray(self.embeddings[keep])
+        gallery.metadatas = self.metadatas[keep]
+        gallery.contact_ids = self.contact_ids[keep]
+        gallery.loaded_at = self.loaded_at
+        gallery._build_centroids(self, [contact_id])
+        return gallery
+
+class GalleryIndex:
+    """
+    In-process cache of per-user face galleries, keyed by user_id.
+    Loaded lazily from ChromaDB (which stays the source of truth) and patched
+    in place by the contact sync functions so recognition never leaves the process.
+    The `None` key holds the unfiltered gallery used when no user_id is given.
+    Only a user's first lookup waits for ChromaDB, behind that user's own lock;
+    an expired gallery keeps being served while a background thread reloads it.
+    """
+    def __init__(self, max_age=GALLERY_MAX_AGE):
+        self.max_age = max_age
+        self._galleries = {}
+        self._lock = threading.Lock()
+        # Per-user load locks, and users whose expired gallery is being reloaded
+        self._load_locks = {}
+        self._refreshing = set()
+        # Bumped by every patch, so a load that started before one is not cached over it
+        self._generation = 0
+
+    def get(self, user_id=None):
+        gallery = self._galleries.get(user_id)
+        if gallery is not None:
+            if time.monotonic() - gallery.loaded_at >= self.max_age:
+                self._start_refresh(user_id)
+            return gallery
+
+        with self._load_lock(user_id):
+            # Another thread may have loaded it while we waited
+            gallery = self._galleries.get(user_id)
+            if gallery is None:
+                gallery = self._load_and_store(user_id)
+            return gallery
+
+    def _load_lock(self, user_id):
+        with self._lock:
+            return self._load_locks.setdefault(user_id, threading.Lock())
+
+    def _load_and_store(self, user_id):
+        with self._lock:
+            generation = self._generation
+        gallery = self._load(user_id)
+        with self._lock:
+            if generation == self._generation:
+                self._galleries[user_id] = gallery
+        return gallery
+
+    def _start_refresh(self, user_id):
+        with self._lock:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+        threading.Thread(target=self._refresh, args=(user_id,), name="face-gallery-refresh", daemon=True).start()
+
+    def _refresh(self, user_id):
+        try:
+            with self._load_lock(user_id):
+                self._load_and_store(user_id)
+        except Exception as e:
+            # Keep serving the expired gallery; the next lookup retries
+            print(f"Error refreshing face gallery for user {user_id}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
+
+    def _load(self, user_id):
+        from app.chroma_client import get_face_collection
+
+        collection = get_face_collection()
+        where = {"user_id": user_id} if user_id else None
+        data = collection.get(where=where, include=["embeddings", "metadatas"])
+        ids = data.get("ids") or []
+        embeddings = data.get("embeddings")
+        if not ids or embeddings is None:
+            return FaceGallery()
+        return FaceGallery(ids, embeddings, data.get("metadatas") or [{} for _ in ids])
+
+    def upsert(self, ids, embeddings, metadatas):
+        """Patch loaded galleries after embeddings were upserted to ChromaDB."""
+        by_user = {}
+        for entry in zip(ids, embeddings, metadatas):
+            by_user.setdefault(entry[2].get("user_id"), []).append(entry)
+
+        with self._lock:
+            self._generation += 1
+            for user_id, entries in by_user.items():
+                gallery = self._galleries.get(user_id)
+                if gallery is not None:
+                    u_ids, u_embs, u_metas = zip(*entries)
+                    self._galleries[user_id] = gallery.upserted(u_ids, u_embs, u_metas)
+            # The unfiltered gallery spans all users; cheaper to reload on demand
+            self._galleries.pop(None, None)
+
+    def remove_contact(self, contact_id):
+        """Drop a contact's embeddings from every loaded gallery."""
+        with self._lock:
+            self._generation += 1
+            for user_id, gallery in list(self._galleries.items()):
+                self._galleries[user_id] = gallery.without_contact(contact_id)
+
+    def invalidate(self, user_id=None):
+        """Forget a user's gallery (or every gallery when user_id is None)."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._galleries.clear()
+            else:
+                self._galleries.pop(user_id, None)
+                self._galleries.pop(None, None)
+
+gallery_index = GalleryIndex()
@@ -0,0 +1,87 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+# Shorter bbox side in original pixels
+FACE_MIN_EMBED_SIZE = int(os.getenv("FACE_MIN_EMBED_SIZE", "32"))
+# Variance of the Laplacian over a 64x64 grayscale face crop
+FACE_MIN_SHARPNESS = float(os.getenv("FACE_MIN_SHARPNESS", "30"))
+# Yaw estimated from the 5-point landmarks, in degrees
+FACE_MAX_YAW = float(os.getenv("FACE_MAX_YAW", "50"))
+
+SHARPNESS_CROP = 64
+
+def estimate_yaw(kps):
+    """
+    Rough yaw in degrees from insightface's 5 landmarks (eyes, nose, mouth corners):
+    the nose drifts towards one eye as the head turns. 0 is frontal, +/-90 full profile.
+    """
+    left_eye, right_eye, nose = kps[0], kps[1], kps[2]
+    d_left = abs(nose[0] - left_eye[0])
+    d_right = abs(right_eye[0] - nose[0])
+    if d_left + d_right <= 0:
+        return 90.0
+    asymmetry = (d_left - d_right) / (d_left + d_right)
+    return float(np.degrees(np.arcsin(np.clip(asymmetry, -1.0, 1.0))))
+
+def sharpness(image, bbox):
+    """Laplacian variance of the face crop, resized to a fixed size so scores compare across face sizes."""
+    h, w = image.shape[:2]
+    x1, y1 = max(int(bbox[0]), 0), max(int(bbox[1]), 0)
+    x2, y2 = min(int(bbox[2]), w), min(int(bbox[3]), h)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+    crop = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    crop = cv2.resize(crop, (SHARPNESS_CROP, SHARPNESS_CROP), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(crop, cv2.CV_64F).var())
+
+class FaceQualityGate:
+    """
+    Cheap checks run before a face is embedded and looked up.
+    Faces that are too small, blurred or in extreme profile waste an ArcFace
+    pass and mostly come back Unknown (or as false matches), so they are skipped.
+    Checks run cheapest first and each skip is counted by reason.
+    """
+    def __init__(self, min_size=FACE_MIN_EMBED_SIZE, min_sharpness=FACE_MIN_SHARPNESS, max_yaw=FACE_MAX_YAW):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self._lock = threading.Lock()
+        self.counters = {"passed": 0, "too_small": 0, "profile": 0, "blurry": 0}
+
+    def check(self, image, face, scale=1):
+        """
+        Return None if the face is worth embedding, else the skip reason.
+        `face` is in original coordinates; `image` may be reduced by `scale`.
+        """
+        reason = None
+        width = face.bbox[2] - face.bbox[0]
+        height = face.bbox[3] - face.bbox[1]
+
+        if min(width, height) < self.min_size:
+            reason = "too_small"
+        elif face.kps is not None and abs(estimate_yaw(face.kps)) > self.max_yaw:
+            reason = "profile"
+        elif self.min_sharpness > 0 and sharpness(image, face.bbox / scale) < self.min_sharpness:
+            reason = "blurry"
+
+        with self._lock:
+            self.counters[reason or "passed"] += 1
+        return reason
+
+    def passes(self, image, face, scale=1):
+        return self.check(image, face, scale) is None
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "min_size": self.min_size,
+            "min_sharpness": self.min_sharpness,
+            "max_yaw": self.max_yaw,
+            "checked": sum(counters.values()),
+            **counters
+        }
+
+quality_gate = FaceQualityGate()
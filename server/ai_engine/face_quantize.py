@@ -0,0 +1,167 @@
+import os
+import cv2
+import numpy as np
+
+# fp32 | int8_dynamic | int8_static
+FACE_MODEL_PRECISION = os.getenv("FACE_MODEL_PRECISION", "fp32")
+# Quantized models are written here once and reused by every process
+FACE_INT8_CACHE_DIR = os.getenv("FACE_INT8_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".insightface", "models", "buffalo_s_int8"
+)
+# Photos used to calibrate activation ranges for int8_static (searched recursively)
+FACE_INT8_CALIBRATION_DIR = os.getenv("FACE_INT8_CALIBRATION_DIR", "")
+
+PRECISIONS = ("fp32", "int8_dynamic", "int8_static")
+CALIBRATION_MAX_IMAGES = 200
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+QUANTIZED_TASKS = ("detection", "recognition")
+
+def list_images(directory):
+    """Image files under `directory`, recursively, in a stable order."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+# Next to a static model path: that model was quantized dynamically instead (no calibration inputs)
+FALLBACK_MARKER = ".fallback"
+
+def quantized_path(model_file, mode, cache_dir=FACE_INT8_CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(model_file))[0]
+    return os.path.join(cache_dir, f"{stem}.int8_{mode}.onnx")
+
+def _detector_blob(det_model, image):
+    """Letterboxed detector input, prepared the way SCRFD.detect does it."""
+    width, height = det_model.input_size
+    ratio = min(width / image.shape[1], height / image.shape[0])
+    resized = cv2.resize(image, (int(image.shape[1] * ratio), int(image.shape[0] * ratio)))
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    canvas[:resized.shape[0], :resized.shape[1]] = resized
+    return cv2.dnn.blobFromImage(
+        canvas, 1.0 / det_model.input_std, (width, height),
+        (det_model.input_mean,) * 3, swapRB=True
+    )
+
+def _recognizer_blob(rec_model, crop):
+    return cv2.dnn.blobFromImages(
+        [crop], 1.0 / rec_model.input_std, rec_model.input_size,
+        (rec_model.input_mean,) * 3, swapRB=True
+    )
+
+def calibration_blobs(app, image_paths):
+    """
+    Model inputs for static calibration: one detector blob per photo and one
+    recognizer blob per face the fp32 detector finds in it.
+    """
+    from insightface.utils import face_align
+
+    det_model, rec_model = app.models["detection"], app.models["recognition"]
+    det_blobs, rec_blobs = [], []
+    for path in image_paths[:CALIBRATION_MAX_IMAGES]:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        det_blobs.append(_detector_blob(det_model, image))
+        _, kpss = det_model.detect(image, max_num=0, metric='default')
+        for kps in kpss if kpss is not None else []:
+            crop = face_align.norm_crop(image, landmark=kps, image_size=rec_model.input_size[0])
+            rec_blobs.append(_recognizer_blob(rec_model, crop))
+    return {"detection": det_blobs, "recognition": rec_blobs}
+
+def quantize_model(model_file, output, mode, blobs=None):
+    """Write an INT8 copy of `model_file` to `output`. Static mode needs calibration blobs."""
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    # Quantize to a temp file and rename, so concurrently starting workers never load a partial file
+    tmp_output = f"{output}.{os.getpid()}.tmp"
+
+    if mode == "dynamic":
+        quantize_dynamic(model_file, tmp_output, weight_type=QuantType.QInt8)
+    else:
+        import onnxruntime as ort
+
+        input_name = ort.InferenceSession(model_file, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+        class BlobReader(CalibrationDataReader):
+            def __init__(self):
+                self._blobs = iter(blobs)
+
+            def get_next(self):
+                blob = next(self._blobs, None)
+                return None if blob is None else {input_name: blob}
+
+        quantize_static(
+            model_file, tmp_output, BlobReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8
+        )
+    os.replace(tmp_output, output)
+    return output
+
+def ensure_quantized(app, mode, calibration_dir=FACE_INT8_CALIBRATION_DIR, cache_dir=FACE_INT8_CACHE_DIR):
+    """
+    Return {task: quantized model path} for the detector and recognizer,
+    quantizing and caching any that are missing. The cache is keyed by model
+    and mode only; delete it to re-calibrate with a different photo set.
+    A model that fell back to dynamic quantization during static calibration
+    is marked as such, and keeps using its dynamic file on later starts.
+    """
+    if mode == "static":
+        images = list_images(calibration_dir) if calibration_dir else []
+        if not images:
+            print("⚠ Warning: int8_static needs FACE_INT8_CALIBRATION_DIR photos, using int8_dynamic")
+            mode = "dynamic"
+
+    paths = {task: quantized_path(app.models[task].model_file, mode, cache_dir) for task in QUANTIZED_TASKS}
+    if mode == "static":
+        # Calibration found no inputs for it last time: the dynamic file stands in for the static one
+        for task, path in paths.items():
+            fallback = quantized_path(app.models[task].model_file, "dynamic", cache_dir)
+            if os.path.exists(path + FALLBACK_MARKER) and os.path.exists(fallback):
+                paths[task] = fallback
+    missing = [task for task, path in paths.items() if not os.path.exists(path)]
+    if not missing:
+        return paths
+
+    blobs = {}
+    if mode == "static":
+        # Detector preprocessing needs input_size, which prepare() sets
+        app.prepare(ctx_id=0, det_size=(320, 320))
+        blobs = calibration_blobs(app, images)
+        if not blobs["recognition"]:
+            print("⚠ Warning: No faces found in calibration photos, quantizing ArcFace dynamically")
+
+    for task in missing:
+        source = app.models[task].model_file
+        task_mode = mode if blobs.get(task) else "dynamic"
+        path = paths[task] if task_mode == mode else quantized_path(source, task_mode, cache_dir)
+        if not os.path.exists(path):
+            print(f"Quantizing {os.path.basename(source)} to INT8 ({task_mode})...")
+            quantize_model(source, path, task_mode, blobs.get(task))
+        if task_mode != mode:
+            open(paths[task] + FALLBACK_MARKER, "w").close()
+        paths[task] = path
+    return paths
+
+def apply_precision(app, precision=FACE_MODEL_PRECISION):
+    """
+    Point the detector and recognizer at their INT8 files when `precision` asks for it.
+    Sessions must be rebuilt afterwards (OrtSessionConfig.apply_to does that).
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown FACE_MODEL_PRECISION '{precision}', expected one of {PRECISIONS}")
+    if precision == "fp32":
+        return app
+
+    paths = ensure_quantized(app, precision.split("_", 1)[1])
+    for task, path in paths.items():
+        app.models[task].model_file = path
+    print(f"✓ Using INT8 face models: {', '.join(os.path.basename(p) for p in paths.values())}")
+    return app
@@ -0,0 +1,182 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+FACE_BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "32"))
+FACE_BATCH_MAX_WAIT_MS = float(os.getenv("FACE_BATCH_MAX_WAIT_MS", "4"))
+FACE_BATCH_MAX_QUEUE = int(os.getenv("FACE_BATCH_MAX_QUEUE", "64"))
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when the shared face inference queue is at capacity."""
+
+class _EmbeddingRequest:
+    def __init__(self, crops):
+        self.crops = crops
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class FaceInferenceScheduler:
+    """
+    Shared micro-batching front end for the ArcFace recognition model.
+    Callers from every session submit aligned face crops; a single worker
+    thread collects requests for up to `max_wait_ms`, runs one batched
+    forward pass over all crops, and resolves each caller's future with its
+    own embeddings. The queue is bounded so overload fails fast instead of
+    growing latency without limit.
+    """
+    def __init__(self, rec_model, max_batch=FACE_BATCH_MAX_SIZE, max_wait_ms=FACE_BATCH_MAX_WAIT_MS, max_queue=FACE_BATCH_MAX_QUEUE):
+        self.rec_model = rec_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = False
+        # Set by stop(); guards enqueueing so nothing lands behind the stop sentinel
+        self._closing = False
+        self._submit_lock = threading.Lock()
+
+        # Metrics
+        self.batches = 0
+        self.crops_processed = 0
+        self.largest_batch = 0
+        self.rejected = 0
+        self._wait_ms = deque(maxlen=1000)
+        self._batch_ms = deque(maxlen=1000)
+
+        self._worker = threading.Thread(target=self._run, name="face-inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def embed(self, crops):
+        """Return an (N, 512) array of embeddings for aligned 112x112 crops. Blocks until ready."""
+        if not crops:
+            return np.empty((0, 512), dtype=np.float32)
+
+        request = _EmbeddingRequest(crops)
+        with self._submit_lock:
+            if self._closing:
+                raise RuntimeError("Face inference scheduler is stopped")
+            try:
+                self._queue.put_nowait(request)
+            except queue.Full:
+                self.rejected += 1
+                raise InferenceQueueFull("Face inference queue is full")
+        return request.future.result()
+
+    def stop(self):
+        """
+        Let the worker thread exit once the requests already queued are served.
+        Later embed() calls raise; anything still queued when the worker exits is failed.
+        """
+        with self._submit_lock:
+            if self._closing:
+                return
+            self._closing = True
+        self._queue.put(None)
+
+    def _fail_pending(self):
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None:
+                request.future.set_exception(RuntimeError("Face inference scheduler is stopped"))
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            self._stopped = True
+            return []
+        batch = [first]
+        size = len(batch[0].crops)
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._stopped = True
+                break
+            batch.append(request)
+            size += len(request.crops)
+        return batch
+
+    def _run(self):
+        while not self._stopped:
+            batch = self._collect()
+            if not batch:
+                break
+            started = time.perf_counter()
+            for request in batch:
+                self._wait_ms.append((started - request.enqueued_at) * 1000)
+
+            crops = [crop for request in batch for crop in request.crops]
+            try:
+                embeddings = self.rec_model.get_feat(crops)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                n = len(request.crops)
+                request.future.set_result(embeddings[offset:offset + n])
+                offset += n
+
+            self.batches += 1
+            self.crops_processed += len(crops)
+            self.largest_batch = max(self.largest_batch, len(crops))
+            self._batch_ms.append((time.perf_counter() - started) * 1000)
+        self._fail_pending()
+
+    def stats(self):
+        wait_ms = np.array(self._wait_ms) if self._wait_ms else np.zeros(1)
+        batch_ms = np.array(self._batch_ms) if self._batch_ms else np.zeros(1)
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "batches": self.batches,
+            "crops_processed": self.crops_processed,
+            "avg_batch_size": round(self.crops_processed / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "rejected": self.rejected,
+            "queue_wait_ms_p50": round(float(np.percentile(wait_ms, 50)), 2),
+            "queue_wait_ms_p99": round(float(np.percentile(wait_ms, 99)), 2),
+            "batch_ms_p50": round(float(np.percentile(batch_ms, 50)), 2),
+            "batch_ms_p99": round(float(np.percentile(batch_ms, 99)), 2),
+        }
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_inference_scheduler(app):
+    """Return the shared scheduler for a loaded FaceAnalysis app, starting it on first use."""
+    scheduler = _schedulers.get(id(app))
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(id(app))
+            if scheduler is None:
+                scheduler = FaceInferenceScheduler(app.models['recognition'])
+                _schedulers[id(app)] = scheduler
+    return scheduler
+
+def release_inference_scheduler(app):
+    """Stop and forget the scheduler of an app that is being unloaded."""
+    with _schedulers_lock:
+        scheduler = _schedulers.pop(id(app), None)
+    if scheduler is not None:
+        scheduler.stop()
+
+def get_scheduler_stats():
+    return [scheduler.stats() for scheduler in _schedulers.values()]
@@ -0,0 +1,149 @@
+import itertools
+import os
+from collections import deque
+import numpy as np
+
+# Frames between re-embeds of a track whose identity is locked; 0 = never re-query it
+FACE_TRACK_LOCKED_REEMBED = int(os.getenv("FACE_TRACK_LOCKED_REEMBED", "30"))
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+class Track:
+    """
+    A face followed across frames. `votes` holds the last few match results
+    as (contact_id, similarity, identity), with contact_id None for Unknown;
+    `identity` is the identity the track currently reports.
+    """
+    def __init__(self, track_id, bbox, vote_window=5):
+        self.track_id = track_id
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.identity = None
+        self.locked = False
+        self.votes = deque(maxlen=vote_window)
+        self.frames_since_embed = 0
+        self.misses = 0
+
+class FaceTracker:
+    """
+    Per-connection IoU tracker for the face recognition stream.
+    Detections are greedily associated to existing tracks by IoU; a face that
+    keeps its track reuses its identity.
+
+    Identities are voted on over the last `vote_window` matches of a track:
+    each match adds its similarity to its contact (Unknown adds `unknown_weight`),
+    and a contact locks once it has `lock_votes` matches and `lock_ratio` of the
+    evidence. A locked identity is only replaced when another one meets the
+    same bar, so single frames near the threshold do not flip it.
+    Unlocked tracks are re-embedded every `retry_interval` frames to gather
+    votes; locked ones every `locked_reembed_interval` frames (0 = never, the
+    identity is kept for the life of the track), or every `reembed_interval`
+    frames while the locked match confidence is below `min_confidence`.
+    """
+    def __init__(self, iou_threshold=0.3, reembed_interval=15, retry_interval=1, min_confidence=0.55, max_misses=5,
+                 vote_window=5, lock_votes=3, lock_ratio=0.6, unknown_weight=0.45,
+                 locked_reembed_interval=FACE_TRACK_LOCKED_REEMBED):
+        self.iou_threshold = iou_threshold
+        self.reembed_interval = reembed_interval
+        self.retry_interval = retry_interval
+        self.min_confidence = min_confidence
+        self.max_misses = max_misses
+        self.vote_window = vote_window
+        self.lock_votes = lock_votes
+        self.lock_ratio = lock_ratio
+        self.unknown_weight = unknown_weight
+        self.locked_reembed_interval = locked_reembed_interval
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, bboxes):
+        """
+        Associate this frame's detections with tracks.
+        Returns the track for every bbox, in the same order; unmatched
+        detections start new tracks and stale tracks are dropped.
+        """
+        assigned = [None] * len(bboxes)
+
+        if self.tracks and len(bboxes):
+            ious = iou_matrix(bboxes, [t.bbox for t in self.tracks])
+            taken = set()
+            # Greedy association, best overlaps first
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                det_idx, track_idx = np.unravel_index(flat, ious.shape)
+                if ious[det_idx, track_idx] < self.iou_threshold:
+                    break
+                if assigned[det_idx] is not None or track_idx in taken:
+                    continue
+                assigned[det_idx] = self.tracks[track_idx]
+                taken.add(track_idx)
+
+        matched = set()
+        for det_idx, track in enumerate(assigned):
+            if track is None:
+                track = Track(next(self._ids), bboxes[det_idx], self.vote_window)
+                self.tracks.append(track)
+                assigned[det_idx] = track
+            else:
+                track.bbox = np.asarray(bboxes[det_idx], dtype=np.float32)
+                track.frames_since_embed += 1
+                track.misses = 0
+            matched.add(track.track_id)
+
+        for track in self.tracks:
+            if track.track_id not in matched:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        return assigned
+
+    def needs_embedding(self, track):
+        if not track.votes:
+            return True
+        if not track.locked:
+            return track.frames_since_embed >= self.retry_interval
+        if track.identity.get("confidence", 0) < self.min_confidence:
+            return track.frames_since_embed >= self.reembed_interval
+        if self.locked_reembed_interval <= 0:
+            return False
+        return track.frames_since_embed >= self.locked_reembed_interval
+
+    def set_identity(self, track, identity):
+        """
+        Add a match result to the track's votes and update its reported identity.
+        Until a contact (or Unknown) locks, the track reports no identity.
+        """
+        contact_id = identity.get("contact_id") if identity.get("name") != "Unknown" else None
+        track.votes.append((contact_id, float(identity.get("confidence", 0.0)), identity))
+        track.frames_since_embed = 0
+
+        evidence, counts, latest = {}, {}, {}
+        for key, similarity, vote in track.votes:
+            evidence[key] = evidence.get(key, 0.0) + (similarity if key is not None else self.unknown_weight)
+            counts[key] = counts.get(key, 0) + 1
+            latest[key] = vote
+
+        leader = max(evidence, key=evidence.get)
+        if counts[leader] < self.lock_votes or evidence[leader] < self.lock_ratio * sum(evidence.values()):
+            # Not decisive: a locked track keeps its identity (hysteresis)
+            return
+
+        track.locked = True
+        if leader is None:
+            track.identity = latest[None]
+        else:
+            # Report the similarity averaged over the window rather than the last frame's
+            similarities = [similarity for key, similarity, _ in track.votes if key == leader]
+            track.identity = {**latest[leader], "confidence": float(np.mean(similarities))}
@@ -0,0 +1,310 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from .frame_ring import FrameRing, SharedFrame
+
+# Number of face inference worker processes; 0 keeps inference in the API process
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", "0"))
+# Shared-memory frame slots (0 = two per worker)
+FACE_FRAME_SLOTS = int(os.getenv("FACE_FRAME_SLOTS", "0"))
+WORKER_START_TIMEOUT = 120.0
+# Seconds a request may wait on a worker before it fails (a live but hung worker)
+FACE_WORKER_TIMEOUT = float(os.getenv("FACE_WORKER_TIMEOUT", "30"))
+
+# Set inside worker processes so face_engine never re-dispatches to a pool
+_in_worker = False
+
+class WorkerCrashed(RuntimeError):
+    """Raised for requests that were in flight on a worker process that died."""
+
+class WorkerTimeout(RuntimeError):
+    """Raised when a worker does not answer a request within FACE_WORKER_TIMEOUT."""
+
+def _worker_main(worker_id, num_workers, requests, results, ring_spec):
+    """Entry point of a worker process: load the models once, then serve requests."""
+    global _in_worker
+    _in_worker = True
+
+    import numpy as np
+    from insightface.app.common import Face
+    from ai_engine import face_engine
+    from ai_engine.ort_tuning import OrtSessionConfig, pin_worker
+
+    # Pin before loading so ONNX Runtime sizes its thread pools for this CPU share
+    cpus = pin_worker(worker_id, num_workers)
+    app = face_engine.load_models(OrtSessionConfig.for_process(num_workers, cpus))
+    ring = FrameRing.attach(*ring_spec) if ring_spec else None
+    results.put((None, worker_id, True, "ready"))
+
+    def frame(image):
+        # Frames arrive either as a (slot, shape) reference into the shared ring or pickled
+        return ring.view(*image) if isinstance(image, tuple) else image
+
+    def detect(image):
+        faces = face_engine.detect_faces(app, frame(image))
+        return _pack_faces(faces)
+
+    def detect_and_embed(image):
+        image = frame(image)
+        faces = face_engine.embed_faces(app, image, face_engine.detect_faces(app, image))
+        return _pack_faces(faces, embeddings=True)
+
+    def embed(image, kpss):
+        faces = [Face(kps=kps) for kps in kpss]
+        face_engine.embed_faces(app, frame(image), faces)
+        return np.stack([f.embedding for f in faces]).astype(np.float32) if faces else np.empty((0, 512), np.float32)
+
+    handlers = {"detect_faces": detect, "detect_and_embed": detect_and_embed, "embed_faces": embed}
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, op, args = request
+        try:
+            results.put((request_id, worker_id, True, handlers[op](*args)))
+        except Exception as e:
+            results.put((request_id, worker_id, False, e))
+
+def _pack_faces(faces, embeddings=False):
+    """Compact wire form of detected faces: a few float32 arrays instead of per-face objects."""
+    import numpy as np
+
+    packed = {
+        "bboxes": np.array([f.bbox for f in faces], dtype=np.float32).reshape(-1, 4),
+        "kpss": np.array([f.kps for f in faces], dtype=np.float32).reshape(-1, 5, 2) if faces and faces[0].kps is not None else None,
+        "scores": np.array([f.det_score for f in faces], dtype=np.float32),
+    }
+    if embeddings:
+        packed["embeddings"] = np.array([f.embedding for f in faces], dtype=np.float32).reshape(-1, 512)
+    return packed
+
+class _Worker:
+    def __init__(self, ctx, worker_id, num_workers, results, ring_spec):
+        self.worker_id = worker_id
+        self.requests = ctx.Queue()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, num_workers, self.requests, results, ring_spec),
+            name=f"face-worker-{worker_id}",
+            daemon=True
+        )
+        self.in_flight = set()
+        self.ready = threading.Event()
+        self.process.start()
+
+class FaceWorkerPool:
+    """
+    Pool of face inference processes, each holding its own load_models() instance.
+    Requests go to the least-loaded live worker; a monitor thread restarts
+    workers that die and fails the requests they had in flight.
+    Calls are blocking and thread-safe, so they slot into asyncio.to_thread.
+    """
+    def __init__(self, num_workers=FACE_WORKERS):
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._futures = {}
+        # Timed-out requests whose shared frame the worker may still be reading: request_id -> (worker, SharedFrame)
+        self._late = {}
+        self._request_ids = itertools.count()
+        self._rr = itertools.count()
+        self.restarts = 0
+        self.timeouts = 0
+
+        # Shared-memory frame slots: two per worker so staging overlaps inference
+        self.ring = None
+        try:
+            self.ring = FrameRing(slots=FACE_FRAME_SLOTS or 2 * num_workers)
+        except Exception as e:
+            print(f"⚠ Warning: Shared-memory frame ring unavailable, frames will be pickled: {e}")
+        self._ring_spec = (self.ring.name, self.ring.slots, self.ring.slot_bytes) if self.ring else None
+
+        self.workers = [_Worker(self._ctx, i, num_workers, self._results, self._ring_spec) for i in range(num_workers)]
+        self._running = True
+
+        threading.Thread(target=self._collect_results, name="face-worker-results", daemon=True).start()
+        threading.Thread(target=self._monitor, name="face-worker-monitor", daemon=True).start()
+
+    def wait_ready(self, timeout=WORKER_START_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.ready.wait(max(0.0, deadline - time.monotonic()))
+        return all(worker.ready.is_set() for worker in self.workers)
+
+    def call(self, op, *args, timeout=FACE_WORKER_TIMEOUT, frame=None):
+        """
+        Run `op` on a worker and return its result. `frame` is the SharedFrame
+        the arguments refer to, if any; on a timeout its slot stays held until
+        that worker answers or is restarted.
+        """
+        future = Future()
+        with self._lock:
+            live = [w for w in self.workers if w.process.is_alive()] or self.workers
+            # Least-loaded first, round-robin between equally loaded workers
+            offset = next(self._rr)
+            worker = min(live, key=lambda w: (len(w.in_flight), (w.worker_id - offset) % len(self.workers)))
+            request_id = next(self._request_ids)
+            self._futures[request_id] = (future, worker)
+            worker.in_flight.add(request_id)
+            # Put under the lock so the monitor cannot replace the worker in between
+            # (its restart would not see this request and never fail it)
+            worker.requests.put((request_id, op, args))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                entry = self._futures.pop(request_id, None)
+                if entry is not None:
+                    worker.in_flight.discard(request_id)
+                    self.timeouts += 1
+                    if frame is not None:
+                        frame.hold()
+                        self._late[request_id] = (worker, frame)
+            if entry is None:
+                # The result (or a crash) was being delivered just as the timeout hit
+                return future.result()
+            error = WorkerTimeout(f"Face worker {worker.worker_id} did not answer '{op}' within {timeout}s")
+            future.set_exception(error)
+            raise error
+
+    def stage(self, image):
+        """
+        Copy a frame into a shared-memory slot so several calls can reuse it.
+        Returns a SharedFrame (release it when done), or the image itself
+        when the ring is unavailable or full.
+        """
+        if self.ring is None or isinstance(image, SharedFrame):
+            return image
+        return self.ring.stage(image) or image
+
+    def _call_with_frame(self, op, image, *args):
+        staged = self.stage(image)
+        try:
+            ref = staged.ref() if isinstance(staged, SharedFrame) else staged
+            return self.call(op, ref, *args, frame=staged if isinstance(staged, SharedFrame) else None)
+        finally:
+            # Only release slots staged here; caller-owned frames outlive the call
+            if isinstance(staged, SharedFrame) and staged is not image:
+                staged.release()
+
+    def detect_and_embed(self, image):
+        packed = self._call_with_frame("detect_and_embed", image)
+        return [{
+            "embedding": embedding.tolist(),
+            "bbox": bbox.tolist(),
+            "det_score": float(score)
+        } for bbox, score, embedding in zip(packed["bboxes"], packed["scores"], packed["embeddings"])]
+
+    def detect_faces(self, image):
+        from insightface.app.common import Face
+
+        packed = self._call_with_frame("detect_faces", image)
+        kpss = packed["kpss"]
+        return [Face(
+            bbox=bbox,
+            kps=kpss[i] if kpss is not None else None,
+            det_score=score
+        ) for i, (bbox, score) in enumerate(zip(packed["bboxes"], packed["scores"]))]
+
+    def embed_faces(self, image, faces):
+        return self._call_with_frame("embed_faces", image, [f.kps for f in faces])
+
+    def _collect_results(self):
+        while self._running:
+            try:
+                request_id, worker_id, ok, value = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if request_id is None:
+                self.workers[worker_id].ready.set()
+                continue
+
+            with self._lock:
+                entry = self._futures.pop(request_id, None)
+                if entry is not None:
+                    entry[1].in_flight.discard(request_id)
+                late = self._late.pop(request_id, None) if entry is None else None
+            if late is not None:
+                # The worker is done with the frame of a request that already timed out
+                late[1].unhold()
+            if entry is None:
+                continue
+            if ok:
+                entry[0].set_result(value)
+            else:
+                entry[0].set_exception(value)
+
+    def _monitor(self):
+        while self._running:
+            time.sleep(1.0)
+            for idx, worker in enumerate(self.workers):
+                if worker.process.is_alive() or not self._running:
+                    continue
+
+                print(f"⚠ Face worker {worker.worker_id} exited (code {worker.process.exitcode}), restarting")
+                with self._lock:
+                    failed = [self._futures.pop(rid) for rid in worker.in_flight if rid in self._futures]
+                    worker.in_flight.clear()
+                    abandoned = [rid for rid, (w, _) in self._late.items() if w is worker]
+                    frames = [self._late.pop(rid)[1] for rid in abandoned]
+                    self.workers[idx] = _Worker(self._ctx, worker.worker_id, len(self.workers), self._results, self._ring_spec)
+                    self.restarts += 1
+                for future, _ in failed:
+                    future.set_exception(WorkerCrashed(f"Face worker {worker.worker_id} crashed"))
+                for frame in frames:
+                    frame.unhold()
+
+    def shutdown(self):
+        self._running = False
+        for worker in self.workers:
+            worker.requests.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+
+    def stats(self):
+        return {
+            "workers": len(self.workers),
+            "alive": sum(1 for w in self.workers if w.process.is_alive()),
+            "ready": sum(1 for w in self.workers if w.ready.is_set()),
+            "in_flight": [len(w.in_flight) for w in self.workers],
+            "restarts": self.restarts,
+            "timeouts": self.timeouts,
+            "held_frames": len(self._late),
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def worker_pool_enabled():
+    return FACE_WORKERS > 0 and not _in_worker
+
+def get_worker_pool():
+    """Return the shared worker pool, starting it on first use; None when disabled."""
+    global _pool
+    if not worker_pool_enabled():
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                print(f"Starting {FACE_WORKERS} face inference worker processes...")
+                _pool = FaceWorkerPool(FACE_WORKERS)
+    return _pool
+
+def shutdown_worker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+
+# Each slot holds one BGR uint8 frame up to this many bytes (default: 1280x720)
+FACE_FRAME_SLOT_BYTES = int(os.getenv("FACE_FRAME_SLOT_BYTES", str(1280 * 720 * 3)))
+
+class SharedFrame:
+    """Handle to a frame staged in a FrameRing slot; only slot index and shape cross processes."""
+    def __init__(self, ring, slot, shape):
+        self.ring = ring
+        self.slot = slot
+        self.shape = tuple(shape)
+        # Holds keep the slot out of the ring past release(), e.g. while a timed-out worker may still read it
+        self._holds = 0
+        self._released = False
+        self._lock = threading.Lock()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def ref(self):
+        return (self.slot, self.shape)
+
+    def hold(self):
+        with self._lock:
+            self._holds += 1
+
+    def unhold(self):
+        with self._lock:
+            self._holds -= 1
+            self._free_if_unused()
+
+    def release(self):
+        with self._lock:
+            self._released = True
+            self._free_if_unused()
+
+    def _free_if_unused(self):
+        if self._released and self._holds == 0 and self.slot is not None:
+            self.ring.release(self.slot)
+            self.slot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class FrameRing:
+    """
+    Fixed ring of frame slots in one multiprocessing.shared_memory block.
+    The API process copies a decoded frame into a free slot and sends only
+    (slot, shape) to an inference worker, which maps the same memory with
+    `attach` + `view` instead of unpickling a ~1 MB array per frame.
+    """
+    def __init__(self, slots, slot_bytes=FACE_FRAME_SLOT_BYTES, name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            # Spawned workers share the parent's resource tracker, so attaching
+            # does not hand ownership (or unlinking) to the worker
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._free = queue.Queue()
+        if self.owner:
+            for slot in range(slots):
+                self._free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        """Map an existing ring from another process (worker side)."""
+        return cls(slots, slot_bytes, name=name)
+
+    def view(self, slot, shape):
+        """Zero-copy uint8 array over a slot."""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def stage(self, image, timeout=0.05):
+        """
+        Copy a frame into a free slot and return a SharedFrame, or None when
+        the frame does not fit or no slot frees up in time (caller falls back to pickling).
+        """
+        if image.dtype != np.uint8 or image.nbytes > self.slot_bytes:
+            return None
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        np.copyto(self.view(slot, image.shape), image)
+        return SharedFrame(self, slot, image.shape)
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,98 @@
+import os
+import struct
+import cv2
+import numpy as np
+
+# Decode just large enough that the longest side stays at or above this many pixels.
+# Detection runs at det_size=(320, 320), so 2x that keeps small faces detectable.
+FACE_DECODE_MIN_SIDE = int(os.getenv("FACE_DECODE_MIN_SIDE", "640"))
+
+REDUCED_MODES = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+# Faces narrower than this (in reduced pixels) are aligned on the full-resolution
+# frame instead, since the ArcFace crop is 112x112
+FULL_RES_EMBED_MIN_FACE = 112
+
+# SOF markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) share the range but do not
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def jpeg_dimensions(data):
+    """
+    Read (width, height) from a JPEG header without decoding it.
+    Returns None for anything that is not a parseable JPEG.
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            # Standalone markers without a length field
+            pos += 2
+            continue
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+class DecodedFrame:
+    """
+    An uploaded frame decoded at reduced resolution for detection.
+    `image` is what detection sees and `scale` maps its coordinates back to
+    the original; `full()` decodes the original resolution on demand, for
+    aligning small faces whose reduced crop would be too coarse.
+    """
+    def __init__(self, data, image, scale=1):
+        self.data = data
+        self.image = image
+        self.scale = scale
+        self._full = image if scale == 1 else None
+
+    def full(self):
+        if self._full is None:
+            self._full = cv2.imdecode(np.frombuffer(self.data, np.uint8), cv2.IMREAD_COLOR)
+        return self._full
+
+def decode_frame(data, min_side=FACE_DECODE_MIN_SIDE):
+    """
+    Decode an uploaded image, using libjpeg's DCT scaling (IMREAD_REDUCED_COLOR_2/4/8)
+    when the JPEG header says the frame is larger than detection needs.
+    Returns a DecodedFrame, or None if the data is not a decodable image.
+    """
+    nparr = np.frombuffer(data, np.uint8)
+    scale, flags = 1, cv2.IMREAD_COLOR
+
+    dims = jpeg_dimensions(data)
+    if dims:
+        longest = max(dims)
+        for factor, mode in REDUCED_MODES:
+            if longest // factor >= min_side:
+                scale, flags = factor, mode
+                break
+
+    image = cv2.imdecode(nparr, flags)
+    if image is None:
+        return None
+    if scale != 1:
+        # Reduced decodes round up (and may be EXIF-rotated), so derive the exact factor from the result
+        scale = max(dims) / max(image.shape[:2])
+    return DecodedFrame(data, image, scale)
+
+def as_decoded(image):
+    """Wrap an already-decoded full-resolution array so it can go through the same path."""
+    return image if isinstance(image, DecodedFrame) else DecodedFrame(None, image, 1)
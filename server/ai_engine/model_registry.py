@@ -0,0 +1,262 @@
+import asyncio
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Unload models unused for this many seconds (0 = keep everything loaded)
+MODEL_IDLE_UNLOAD_SECONDS = float(os.getenv("MODEL_IDLE_UNLOAD_SECONDS", "0"))
+# Models loaded and warmed up at startup, comma separated
+MODEL_WARMUP = [name.strip() for name in os.getenv("MODEL_WARMUP", "face").split(",") if name.strip()]
+IDLE_CHECK_INTERVAL = 30.0
+
+def process_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _ModelEntry:
+    def __init__(self, name, loader, warmup=None, on_unload=None, unloadable=True):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.on_unload = on_unload
+        self.unloadable = unloadable
+        self.instance = None
+        self.loaded = False
+        self.refcount = 0
+        self.loads = 0
+        self.load_seconds = None
+        self.rss_bytes = None
+        self.loaded_at = None
+        self.last_used = None
+
+class ModelRegistry:
+    """
+    Single owner of the heavyweight models (FaceAnalysis, WhisperModel) and LLM clients.
+    Models load lazily on first use behind a lock, so concurrent first requests
+    share one load. Loads are serialized so the RSS growth measured around each
+    one can be attributed to that model. Long-lived users (WebSocket sessions)
+    hold a reference with retain/release; models with no references that have
+    been idle longer than MODEL_IDLE_UNLOAD_SECONDS are unloaded.
+    """
+    def __init__(self, idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS):
+        self.idle_unload_seconds = idle_unload_seconds
+        self.running = False
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Reentrant so a loader can get() the models it depends on
+        self._load_lock = threading.RLock()
+
+    def register(self, name, loader, warmup=None, on_unload=None, unloadable=True):
+        """
+        Register a model under `name`. `loader()` returns the instance,
+        `warmup(instance)` runs a dummy inference and `on_unload(instance)`
+        releases anything else holding on to it.
+        """
+        with self._lock:
+            self._entries[name] = _ModelEntry(name, loader, warmup, on_unload, unloadable)
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown model '{name}'")
+        return entry
+
+    def _load(self, entry):
+        with self._load_lock:
+            if entry.loaded:
+                return entry.instance
+            rss_before = process_rss()
+            started = time.perf_counter()
+            instance = entry.loader()
+            entry.load_seconds = round(time.perf_counter() - started, 3)
+            rss_after = process_rss()
+            entry.rss_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            with self._lock:
+                entry.instance = instance
+                entry.loads += 1
+                entry.loaded_at = entry.last_used = time.time()
+                entry.loaded = True
+            print(f"✓ Model '{entry.name}' loaded in {entry.load_seconds:.2f}s")
+            return instance
+
+    def get(self, name):
+        """Return the model, loading it on first use."""
+        entry = self._entry(name)
+        with self._lock:
+            if entry.loaded:
+                entry.last_used = time.time()
+                return entry.instance
+        return self._load(entry)
+
+    def peek(self, name):
+        """Return the model if it is loaded, without loading it or counting as a use."""
+        entry = self._entry(name)
+        return entry.instance if entry.loaded else None
+
+    def retain(self, name):
+        """Like get(), but keeps the model loaded until a matching release()."""
+        entry = self._entry(name)
+        with self._lock:
+            entry.refcount += 1
+        try:
+            return self.get(name)
+        except Exception:
+            self.release(name)
+            raise
+
+    def release(self, name):
+        entry = self._entry(name)
+        with self._lock:
+            entry.refcount = max(0, entry.refcount - 1)
+        entry.last_used = time.time()
+
+    @contextmanager
+    def acquire(self, name):
+        instance = self.retain(name)
+        try:
+            yield instance
+        finally:
+            self.release(name)
+
+    def warmup(self, names=None):
+        """Load the named models (default MODEL_WARMUP) and run their warmup inference."""
+        for name in names if names is not None else MODEL_WARMUP:
+            if name not in self._entries:
+                print(f"⚠ Warning: Unknown model '{name}' in warmup list")
+                continue
+            try:
+                instance = self.get(name)
+                entry = self._entries[name]
+                if entry.warmup is not None:
+                    entry.warmup(instance)
+                print(f"✓ Model '{name}' warmed up and ready")
+            except Exception as e:
+                print(f"⚠ Warning: Failed to warm up model '{name}': {e}")
+
+    def unload(self, name):
+        """Drop a loaded model if nothing holds a reference to it. Returns True if unloaded."""
+        entry = self._entry(name)
+        with self._load_lock:
+            with self._lock:
+                if not entry.loaded or entry.refcount > 0:
+                    return False
+                instance, entry.instance, entry.loaded = entry.instance, None, False
+            if entry.on_unload is not None:
+                try:
+                    entry.on_unload(instance)
+                except Exception as e:
+                    print(f"⚠ Warning: Error releasing model '{name}': {e}")
+            del instance
+            gc.collect()
+        print(f"Model '{name}' unloaded")
+        return True
+
+    def unload_idle(self, max_idle=None):
+        """Unload unreferenced models idle for longer than `max_idle` seconds."""
+        max_idle = self.idle_unload_seconds if max_idle is None else max_idle
+        now = time.time()
+        unloaded = []
+        for name, entry in list(self._entries.items()):
+            if (entry.unloadable and entry.loaded and entry.refcount == 0
+                    and entry.last_used is not None and now - entry.last_used > max_idle):
+                if self.unload(name):
+                    unloaded.append(name)
+        return unloaded
+
+    async def start(self):
+        """Periodically unload idle models; does nothing when idle unloading is disabled."""
+        if self.idle_unload_seconds <= 0:
+            return
+        self.running = True
+        while self.running:
+            await asyncio.sleep(IDLE_CHECK_INTERVAL)
+            try:
+                await asyncio.to_thread(self.unload_idle)
+            except Exception as e:
+                print(f"⚠ Warning: Idle model unload failed: {e}")
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        now = time.time()
+        return {
+            "idle_unload_seconds": self.idle_unload_seconds,
+            "process_rss_bytes": process_rss(),
+            "models": {
+                name: {
+                    "loaded": entry.loaded,
+                    "refcount": entry.refcount,
+                    "loads": entry.loads,
+                    "load_seconds": entry.load_seconds,
+                    "rss_bytes": entry.rss_bytes,
+                    "loaded_at": entry.loaded_at,
+                    "last_used": entry.last_used,
+                    "idle_seconds": round(now - entry.last_used, 1) if entry.last_used else None,
+                    "unloadable": entry.unloadable,
+                } for name, entry in self._entries.items()
+            }
+        }
+
+model_registry = ModelRegistry()
+
+# --- Built-in models -------------------------------------------------------
+
+def _load_face():
+    from .face_engine import load_models
+    from .face_workers import worker_pool_enabled, get_worker_pool
+    if worker_pool_enabled():
+        # Models live in the worker processes; nothing to load here
+        get_worker_pool()
+        return None
+    return load_models()
+
+def _warmup_face(app):
+    import numpy as np
+    from .face_engine import detect_and_embed
+    from .face_workers import get_worker_pool
+
+    pool = get_worker_pool()
+    if pool is not None and not pool.wait_ready():
+        print("⚠ Warning: Not all face inference workers became ready")
+    # Dummy inference to initialize CPU kernels
+    detect_and_embed(app, np.zeros((480, 480, 3), dtype=np.uint8))
+
+def _unload_face(app):
+    from .face_scheduler import release_inference_scheduler
+    if app is not None:
+        release_inference_scheduler(app)
+
+def _load_asr():
+    from .asr import ASREnginePool
+    # Use 'base.en' model which is optimized for English; ASR_POOL_SIZE copies of it
+    return ASREnginePool(model_size="base.en")
+
+def _unload_asr(pool):
+    pool.stop()
+
+def _load_summarizer():
+    from .summarizer import InteractionSummarizer
+    return InteractionSummarizer(client=model_registry.get("gemini"))
+
+def _load_gemini():
+    from google import genai
+    # The client gets the API key from the environment variable `GEMINI_API_KEY`
+    return genai.Client()
+
+model_registry.register("face", _load_face, warmup=_warmup_face, on_unload=_unload_face)
+model_registry.register("asr", _load_asr, on_unload=_unload_asr)
+# LLM clients are cheap to hold, so they are never unloaded
+model_registry.register("summarizer", _load_summarizer, unloadable=False)
+model_registry.register("gemini", _load_gemini, unloadable=False)
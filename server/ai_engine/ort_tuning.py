@@ -0,0 +1,125 @@
+import os
+
+# ONNX Runtime session settings for the face models.
+# 0 threads = let ONNX Runtime decide; with FACE_WORKERS set, intra-op threads
+# default to an even share of the cores so worker processes do not oversubscribe.
+FACE_ORT_INTRA_THREADS = int(os.getenv("FACE_ORT_INTRA_THREADS", "0"))
+FACE_ORT_INTER_THREADS = int(os.getenv("FACE_ORT_INTER_THREADS", "0"))
+# sequential | parallel
+FACE_ORT_EXECUTION_MODE = os.getenv("FACE_ORT_EXECUTION_MODE", "sequential")
+# disable | basic | extended | all
+FACE_ORT_GRAPH_OPT = os.getenv("FACE_ORT_GRAPH_OPT", "all")
+FACE_ORT_MEM_ARENA = os.getenv("FACE_ORT_MEM_ARENA", "true").lower() == "true"
+# Busy-wait in idle ORT threads; lower latency for one caller, wasted cores under concurrency
+FACE_ORT_SPINNING = os.getenv("FACE_ORT_SPINNING", "true").lower() == "true"
+# Worker CPU pinning: empty = off, "auto" = split available cores evenly,
+# or explicit per-worker sets such as "0-3;4-7"
+FACE_CPU_AFFINITY = os.getenv("FACE_CPU_AFFINITY", "")
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def parse_cpu_list(spec):
+    """Parse "0-3,6" into [0, 1, 2, 3, 6]."""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def worker_cpu_set(worker_id, num_workers, spec=FACE_CPU_AFFINITY):
+    """CPUs a face worker process should be pinned to, or None to leave it unpinned."""
+    if not spec:
+        return None
+    if spec == "auto":
+        cpus = available_cpus()
+        share = max(1, len(cpus) // max(1, num_workers))
+        start = (worker_id * share) % len(cpus)
+        return cpus[start:start + share]
+    sets = [s for s in spec.split(";") if s.strip()]
+    return parse_cpu_list(sets[worker_id % len(sets)]) if sets else None
+
+def pin_worker(worker_id, num_workers):
+    """Pin the calling process to its CPU share. Returns the CPU list or None."""
+    cpus = worker_cpu_set(worker_id, num_workers)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+        return cpus
+    return None
+
+class OrtSessionConfig:
+    """
+    Session options applied to every ONNX model in the FaceAnalysis pack.
+    insightface builds its sessions with default SessionOptions, so
+    apply_to() recreates them with these settings before prepare().
+    """
+    def __init__(self, intra_threads=FACE_ORT_INTRA_THREADS, inter_threads=FACE_ORT_INTER_THREADS,
+                 execution_mode=FACE_ORT_EXECUTION_MODE, graph_opt=FACE_ORT_GRAPH_OPT,
+                 mem_arena=FACE_ORT_MEM_ARENA, spinning=FACE_ORT_SPINNING):
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self.execution_mode = execution_mode
+        self.graph_opt = graph_opt
+        self.mem_arena = mem_arena
+        self.spinning = spinning
+
+    @classmethod
+    def for_process(cls, num_workers=0, cpus=None, **overrides):
+        """Defaults for this process: split the cores between workers when threads are not set."""
+        config = cls(**overrides)
+        if config.intra_threads == 0 and (num_workers > 0 or cpus):
+            config.intra_threads = len(cpus) if cpus else max(1, len(available_cpus()) // num_workers)
+        return config
+
+    def session_options(self):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if self.intra_threads:
+            opts.intra_op_num_threads = self.intra_threads
+        if self.inter_threads:
+            opts.inter_op_num_threads = self.inter_threads
+        opts.execution_mode = {
+            "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+            "parallel": ort.ExecutionMode.ORT_PARALLEL,
+        }[self.execution_mode]
+        opts.graph_optimization_level = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.graph_opt]
+        opts.enable_cpu_mem_arena = self.mem_arena
+        spin = "1" if self.spinning else "0"
+        opts.add_session_config_entry("session.intra_op.allow_spinning", spin)
+        opts.add_session_config_entry("session.inter_op.allow_spinning", spin)
+        return opts
+
+    def apply_to(self, app, providers=('CPUExecutionProvider',)):
+        """Rebuild the session of each loaded model with these options."""
+        import onnxruntime as ort
+
+        opts = self.session_options()
+        for model in app.models.values():
+            # Input/output names are read from the file, so they match the new session
+            model.session = ort.InferenceSession(model.model_file, sess_options=opts, providers=list(providers))
+        return app
+
+    def as_dict(self):
+        return {
+            "intra_threads": self.intra_threads,
+            "inter_threads": self.inter_threads,
+            "execution_mode": self.execution_mode,
+            "graph_opt": self.graph_opt,
+            "mem_arena": self.mem_arena,
+            "spinning": self.spinning,
+        }
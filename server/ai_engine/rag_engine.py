@@ -10,18 +10,19 @@ from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
 class InteractionRAG:
-    def __init__(self, chroma_collection, db_session: Optional[Session] = None):
+    def __init__(self, chroma_collection, db_session: Optional[Session] = None, client=None):
         """
         Initialize RAG engine with ChromaDB collection and database session
         
         Args:
             chroma_collection: ChromaDB collection for semantic search
             db_session: SQLAlchemy database session for structured queries
+            client: Shared Gemini client; a new one is created if omitted
         """
         self.collection = chroma_collection
         self.db = db_session
         # The client gets the API key from the environment variable `GEMINI_API_KEY`
-        self.client = genai.Client()
+        self.client = client or genai.Client()
         self.model_name = 'gemini-2.5-flash'
     
     def _get_contact_info(self, user_id: int, contact_name: Optional[str] = None) -> List[Dict]:
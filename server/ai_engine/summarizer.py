@@ -8,9 +8,9 @@ from datetime import datetime, timedelta
 from google import genai
 
 class InteractionSummarizer:
-    def __init__(self):
+    def __init__(self, client=None):
         # The client gets the API key from the environment variable `GEMINI_API_KEY`
-        self.client = genai.Client()
+        self.client = client or genai.Client()
         self.model_name = 'gemini-2.5-flash'
     
     def summarize_interactions(
@@ -28,6 +28,8 @@ from .routes.asrRoutes import router as asr_router
 from .routes.statsRoutes import router as stats_router
 from .routes.aiRoutes import router as ai_router
 from .scheduler import scheduler
+from .services.last_seen_writer import last_seen_writer
+from ai_engine.model_registry import model_registry
 
 CLIENT_URL = os.getenv("CLIENT_URL", "http://localhost:5173")
 GLASS_URL = os.getenv("GLASS_URL", "http://localhost:5174")
@@ -47,37 +49,33 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠ Warning: Database initialization failed: {e}")
 
-    # Startup: Pre-load face recognition models to avoid cold start delays
+    # Startup: Pre-load models (MODEL_WARMUP, face by default) to avoid cold start delays
     if os.getenv("SKIP_WARMUP", "false").lower() == "true":
-        print("⏭ Skipping face recognition warmup as requested")
+        print("⏭ Skipping model warmup as requested")
     else:
-        try:
-            from .routes.contactRoutes import get_face_app
-            import numpy as np
-            import cv2
-            
-            print("Pre-loading face recognition models...")
-            face_app = get_face_app()
-            print("✓ Face recognition models loaded")
-            
-            # Warmup: Run a dummy inference to initialize CUDA/CPU kernels
-            print("Warming up face recognition engine...")
-            dummy_image = np.zeros((480, 480, 3), dtype=np.uint8)
-            face_app.get(dummy_image)
-            print("✓ Face recognition engine warmed up and ready")
-        except Exception as e:
-            print(f"⚠ Warning: Failed to pre-load face recognition models: {e}")
+        print("Pre-loading and warming up models...")
+        await asyncio.to_thread(model_registry.warmup)
     
-    # Startup: Start the reminder scheduler
+    # Startup: Start the reminder scheduler, the last_seen writer and the idle model reaper
     scheduler_task = asyncio.create_task(scheduler.start())
+    last_seen_task = asyncio.create_task(last_seen_writer.start())
+    model_reaper_task = asyncio.create_task(model_registry.start())
     yield
-    # Shutdown: Stop the scheduler
+    # Shutdown: Stop the scheduler and face inference workers
+    from ai_engine.face_workers import shutdown_worker_pool
+    shutdown_worker_pool()
     scheduler.stop()
     scheduler_task.cancel()
-    try:
-        await scheduler_task
-    except asyncio.CancelledError:
-        pass
+    last_seen_task.cancel()
+    model_registry.stop()
+    model_reaper_task.cancel()
+    for task in (scheduler_task, last_seen_task, model_reaper_task):
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    # Write out sightings buffered since the last flush
+    last_seen_writer.stop()
 
 app = FastAPI(
     title="MindTrace",
@@ -138,4 +136,32 @@ def scheduler_health():
         "running": scheduler.running,
         "check_interval": scheduler.check_interval,
         "last_reset_date": str(scheduler.last_reset_date) if scheduler.last_reset_date else None
-    }
\ No newline at end of file
+    }
+
+@app.get("/health/models")
+def models_health():
+    """Load state, load time, RSS growth and last use of each registered model"""
+    return model_registry.stats()
+
+@app.get("/health/asr")
+def asr_health():
+    """Queue, priority and drop metrics for the ASR engine pool (null until loaded)"""
+    pool = model_registry.peek("asr")
+    return {"pool": pool.stats() if pool is not None else None}
+
+@app.get("/health/face-inference")
+def face_inference_health():
+    """Batching metrics for the shared face inference scheduler and worker pool"""
+    from ai_engine.face_scheduler import get_scheduler_stats
+    from ai_engine.face_workers import worker_pool_enabled, get_worker_pool, FACE_WORKERS
+    from ai_engine.face_quality import quality_gate
+    from ai_engine.ort_tuning import OrtSessionConfig
+    from .services.enrichment_cache import enrichment_cache
+    return {
+        "schedulers": get_scheduler_stats(),
+        "quality_gate": quality_gate.stats(),
+        "ort_session": OrtSessionConfig.for_process(FACE_WORKERS).as_dict(),
+        "enrichment_cache": enrichment_cache.stats(),
+        "last_seen_writer": last_seen_writer.stats(),
+        "worker_pool": get_worker_pool().stats() if worker_pool_enabled() else None
+    }
@@ -10,7 +10,7 @@ from ..database import get_db
 from ..models import Interaction, User
 from ..utils.auth import get_current_user
 from ..chroma_client import get_conversation_collection
-from ai_engine.summarizer import InteractionSummarizer
+from ai_engine.model_registry import model_registry
 from ai_engine.rag_engine import InteractionRAG
 
 router = APIRouter(
@@ -40,16 +40,6 @@ class MultiTurnRAGRequest(BaseModel):
 class InsightsRequest(BaseModel):
     topic: Optional[str] = None
 
-# AI engines are loaded lazily to speed up startup
-summarizer = None
-
-def get_summarizer():
-    global summarizer
-    if summarizer is None:
-        from ai_engine.summarizer import InteractionSummarizer
-        summarizer = InteractionSummarizer()
-    return summarizer
-
 @router.post("/summarize")
 def summarize_interactions(
     request: SummarizeRequest,
@@ -104,7 +94,7 @@ def summarize_interactions(
             })
         
         # Generate summary
-        summarizer_engine = get_summarizer()
+        summarizer_engine = model_registry.get("summarizer")
         result = summarizer_engine.summarize_interactions(
             interaction_dicts,
             summary_type=request.summary_type,
@@ -164,7 +154,7 @@ def summarize_contact_interactions(
             })
         
         # Generate contact-specific summary
-        summarizer_engine = get_summarizer()
+        summarizer_engine = model_registry.get("summarizer")
         result = summarizer_engine.generate_contact_summary(interaction_dicts, contact.name)
         
         return result
@@ -189,7 +179,7 @@ def rag_query(
     """
     try:
         collection = get_conversation_collection()
-        rag_engine = InteractionRAG(collection, db_session=db)
+        rag_engine = InteractionRAG(collection, db_session=db, client=model_registry.get("gemini"))
         
         result = rag_engine.query(
             question=request.question,
@@ -217,7 +207,7 @@ def rag_multi_turn(
     """
     try:
         collection = get_conversation_collection()
-        rag_engine = InteractionRAG(collection, db_session=db)
+        rag_engine = InteractionRAG(collection, db_session=db, client=model_registry.get("gemini"))
         
         result = rag_engine.multi_turn_query(
             question=request.question,
@@ -245,7 +235,7 @@ def get_insights(
     """
     try:
         collection = get_conversation_collection()
-        rag_engine = InteractionRAG(collection, db_session=db)
+        rag_engine = InteractionRAG(collection, db_session=db, client=model_registry.get("gemini"))
         
         result = rag_engine.get_insights(
             user_id=current_user.id,
@@ -272,7 +262,7 @@ def rag_contacts_query(
     """
     try:
         collection = get_conversation_collection()
-        rag_engine = InteractionRAG(collection, db_session=db)
+        rag_engine = InteractionRAG(collection, db_session=db, client=model_registry.get("gemini"))
         
         # Force contact context retrieval
         result = rag_engine.query(
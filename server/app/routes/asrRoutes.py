@@ -1,4 +1,5 @@
 import asyncio
+import uuid
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, status
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
@@ -13,32 +14,21 @@ from jose import jwt, JWTError
 # Ensure we can import from ai_engine
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from ai_engine.asr import ASREngine, ConversationStore, ConversationLinker
+from ai_engine.asr import ConversationStore, ConversationLinker, StreamingTranscriber, SpeechSegmenter, ASRQueueFull
+from ai_engine.asr.asr_pool import PRIORITY_FINAL, PRIORITY_SUBTITLE
+from ai_engine.asr.streaming_transcriber import words_text, decode_snapshot
+from ai_engine.model_registry import model_registry
 from ..database import get_db
 from ..models import Contact, User
 from ..chroma_client import get_conversation_collection
 from ..utils.auth import SECRET_KEY, ALGORITHM
+from ..services.enrichment_cache import enrichment_cache
 
 router = APIRouter(
     prefix="/asr",
     tags=["ASR"]
 )
 
-# Face recognition app and ASR engine are loaded lazily to speed up startup
-asr_engine = None
-
-def get_asr_engine():
-    global asr_engine
-    if asr_engine is None:
-        try:
-            # Use 'base.en' model which is optimized for English
-            asr_engine = ASREngine(model_size="base.en")
-            print("✓ ASR Engine initialized.")
-        except Exception as e:
-            print(f"Failed to initialize ASR Engine: {e}")
-            asr_engine = None
-    return asr_engine
-
 @router.get("/conversations")
 async def get_conversations(
     profile_id: str = None,
@@ -110,6 +100,8 @@ async def sync_conversations_to_db(
             db.add(db_interaction)
             db.commit()
             db.refresh(db_interaction)
+            if contact_id:
+                enrichment_cache.invalidate(contact_id)
             
             # Add to ChromaDB
             try:
@@ -235,6 +227,38 @@ async def search_conversations(
         traceback.print_exc()
         return {"results": [], "count": 0, "error": str(e)}
 
+SAMPLE_RATE = 16000
+
+def read_session_audio(path, start, end):
+    """float32 samples between two times (seconds) of a session's raw audio file."""
+    first = int(start * SAMPLE_RATE)
+    count = max(0, int(end * SAMPLE_RATE) - first)
+    with open(path, "rb") as f:
+        f.seek(first * 4)
+        return np.frombuffer(f.read(count * 4), dtype=np.float32)
+
+def final_session_transcript(engine, streamer, audio_path, segmenter=None):
+    """
+    Transcript of a whole live session at close, run as an ASREnginePool job.
+    Built from the words already committed while streaming: the audio received
+    since the last subtitle pass is decoded, and only short low-confidence
+    regions are read back from the session file and decoded again. A session
+    in which `segmenter` found no speech is empty; otherwise the whole file is
+    only transcribed if nothing was committed while streaming.
+    """
+    if segmenter is not None and segmenter.utterances == 0:
+        return ""
+    if streamer:
+        streamer.process(engine)
+        streamer.flush()
+        if streamer.committed:
+            words = streamer.final_words(lambda start, end: read_session_audio(audio_path, start, end), engine)
+            return words_text(words)
+
+    with open(audio_path, "rb") as f:
+        full_audio = np.frombuffer(f.read(), dtype=np.float32)
+    return engine.transcribe_audio_chunk(full_audio)
+
 @router.websocket("/{user_id}/{profile_id}")
 async def websocket_asr(
     websocket: WebSocket, 
@@ -324,12 +348,12 @@ async def websocket_asr(
     session_audio_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pcm')
     start_time = asyncio.get_event_loop().time()
     
-    audio_buffer_ram = [] # Keep small buffer for real-time subtitles only
     chunk_counter = 0
     total_bytes_received = 0
     
     TRANSCRIBE_INTERVAL_CHUNKS = 5 # Slightly increased to batch better
-    RMS_THRESHOLD = 0.002 # Adjusted: 0.0003 was too sensitive, picking up noise. 0.005 is normal speech.
+    RMS_THRESHOLD = 0.002 # Speech quieter than this (distant voices, TV) is not transcribed live
+    SUBTITLE_MAX_CHARS = 120 # Committed text shown ahead of the tentative part
     
     last_activity_time = asyncio.get_event_loop().time()
     IDLE_TIMEOUT = 60.0 # Extended further
@@ -337,10 +361,14 @@ async def websocket_asr(
     last_ping_time = asyncio.get_event_loop().time()
     PING_INTERVAL = 20.0 
 
-    # Get engine lazily
-    engine = get_asr_engine()
+    # Get the shared engine pool lazily, held for the session so it is not unloaded as idle
+    try:
+        asr_pool = await asyncio.to_thread(model_registry.retain, "asr")
+    except Exception as e:
+        print(f"Failed to initialize ASR Engine: {e}")
+        asr_pool = None
     
-    if not engine:
+    if not asr_pool:
         print("❌ Error: ASR Engine is not initialized")
         try:
             await websocket.send_json({
@@ -352,6 +380,82 @@ async def websocket_asr(
     else:
         print("✓ ASR Engine ready")
 
+    # Real-time subtitles: VAD passes on utterance audio only, and only audio
+    # after the last committed word is kept and re-decoded
+    streamer = StreamingTranscriber() if asr_pool else None
+    segmenter = SpeechSegmenter() if asr_pool else None
+    subtitle_committed = ""
+    subtitle_tasks = set()
+    utterance_tasks = set()
+    # Pool key for this session's queued subtitle (object ids can be reused once collected)
+    pool_session = uuid.uuid4().hex
+
+    async def decode(priority):
+        """
+        Decode the streamer's uncommitted audio on the engine pool. The streamer
+        itself is only touched here on the event loop. Returns (committed, tentative),
+        or None if the job was replaced by a newer subtitle or its result is stale.
+        """
+        snapshot = streamer.snapshot()
+        if len(snapshot.audio) == 0:
+            return [], streamer.tentative
+        future = asr_pool.submit(decode_snapshot, snapshot, priority=priority, session=pool_session)
+        words = await asyncio.wrap_future(future)
+        if words is None:
+            return None
+        return streamer.apply(snapshot, words)
+
+    async def update_subtitle():
+        nonlocal subtitle_committed
+        try:
+            result = await decode(PRIORITY_SUBTITLE)
+        except ASRQueueFull:
+            # Overloaded: skip this subtitle, the next one covers the same audio
+            return
+        except Exception as e:
+            print(f"Incremental transcribe error: {e}")
+            return
+        if result is None:
+            return
+        committed, tentative = result
+        if committed:
+            subtitle_committed = f"{subtitle_committed} {words_text(committed)}".strip()[-SUBTITLE_MAX_CHARS:]
+        try:
+            await send_subtitle(subtitle_committed, words_text(tentative))
+        except Exception as e:
+            print(f"Error sending subtitle: {e}")
+
+    async def finish_utterance(snapshot, shown_committed):
+        """Final decode of an ended utterance, ahead of every session's subtitles."""
+        words = []
+        try:
+            if len(snapshot.audio):
+                future = asr_pool.submit(decode_snapshot, snapshot, priority=PRIORITY_FINAL)
+                words = await asyncio.wrap_future(future)
+        except Exception as e:
+            # Its tentative words are committed instead
+            print(f"Utterance finalization error: {e}")
+        committed = streamer.finish_utterance(snapshot, words or [])
+        final_text = f"{shown_committed} {words_text(committed)}".strip()[-SUBTITLE_MAX_CHARS:]
+        try:
+            await send_subtitle(final_text, final=True)
+        except Exception as e:
+            print(f"Error sending subtitle: {e}")
+
+    async def send_subtitle(committed_text, tentative_text="", final=False):
+        nonlocal last_transcript
+        transcript = f"{committed_text} {tentative_text}".strip()
+        if transcript and transcript != last_transcript:
+            last_transcript = transcript
+            print(f"✓ Subtitle{' (final)' if final else ''}: {transcript}")
+            await websocket.send_json({
+                "type": "subtitle",
+                "text": transcript,
+                "committed": committed_text,
+                "tentative": tentative_text,
+                "final": final
+            })
+
 
     connection_close_reason = None
     
@@ -422,22 +526,24 @@ async def websocket_asr(
             except Exception as e:
                 print(f"Error writing to temp file: {e}")
             
-            # 2. Process for Real-time Subtitles (Keep small RAM buffer)
+            # 2. Process for Real-time Subtitles (uncommitted audio only; full backup on disk)
             try:
                 # Convert bytes to numpy array (float32) for fast processing
                 chunk = np.frombuffer(data, dtype=np.float32)
                 
-                audio_buffer_ram.append(chunk)
                 chunk_counter += 1
-                
-                # Manage RAM buffer size (Running window of ~6 seconds)
-                # If too large, pop from front (we have full backup on disk)
-                # 6s * 16000 = 96000 samples
-                current_ram_samples = sum(len(c) for c in audio_buffer_ram)
-                if current_ram_samples > 96000:
-                    # Remove chunks from beginning until we are under limit
-                    while len(audio_buffer_ram) > 1 and sum(len(c) for c in audio_buffer_ram) > 96000:
-                         audio_buffer_ram.pop(0)
+                if segmenter:
+                    for kind, sample, speech in segmenter.feed(chunk):
+                        if kind == "speech":
+                            streamer.insert_audio(speech, at_sample=sample)
+                            continue
+                        # Utterance ended: close it now and finalize it in a task, so audio intake
+                        # and the next utterance's events are not held up by the decode
+                        task = asyncio.create_task(finish_utterance(streamer.end_utterance(), subtitle_committed))
+                        utterance_tasks.add(task)
+                        task.add_done_callback(utterance_tasks.discard)
+                        subtitle_committed = ""
+                        last_transcript = ""
 
                 # Log periodic
                 if chunk_counter % 50 == 0:
@@ -448,39 +554,16 @@ async def websocket_asr(
                 continue
             
             # --- Incremental Transcription for Subtitles ---
-            if chunk_counter >= TRANSCRIBE_INTERVAL_CHUNKS and asr_engine:
+            # Only runs inside an utterance: the buffer holds speech audio only.
+            # Runs as a task so audio keeps being received while the pool is busy;
+            # a subtitle still queued is replaced by this newer one.
+            if chunk_counter >= TRANSCRIBE_INTERVAL_CHUNKS and streamer and streamer.ready():
                 chunk_counter = 0
-                try:
-                    # Create continuous buffer from RAM chunks
-                    current_window = np.concatenate(audio_buffer_ram)
-                    
-                    # Enhanced VAD: RMS
-                    rms = np.sqrt(np.mean(current_window**2))
-                    
-                    if len(current_window) > 8000 and rms > RMS_THRESHOLD:
-                         # Run ASR on threadpool
-                        transcript = await asyncio.to_thread(engine.transcribe_audio_chunk, current_window)
-                        
-                        if transcript and transcript.strip() and transcript != last_transcript:
-                            last_transcript = transcript
-                            print(f"✓ Subtitle: {transcript}")
-                            await websocket.send_json({
-                                "type": "subtitle",
-                                "text": transcript
-                            })
-                    else:
-                        # Clear subtitle if silence
-                         if rms <= RMS_THRESHOLD and last_transcript:
-                            # Only clear if we really think it's silent for a bit
-                            # Check if just the END is silent? No, straightforward RMS is okay for now.
-                            last_transcript = ""
-                            await websocket.send_json({
-                                "type": "subtitle",
-                                "text": ""
-                            })
-
-                except Exception as e:
-                    print(f"Incremental transcribe error: {e}")
+                # RMS is kept up to date by the ring buffer as audio arrives
+                if len(streamer.buffer) > 8000 and streamer.buffer.rms() > RMS_THRESHOLD:
+                    task = asyncio.create_task(update_subtitle())
+                    subtitle_tasks.add(task)
+                    task.add_done_callback(subtitle_tasks.discard)
             # -----------------------------------------------
 
     except WebSocketDisconnect:
@@ -495,33 +578,36 @@ async def websocket_asr(
         # Always process and save the conversation on connection close
         print(f"Connection closed ({connection_close_reason}). Processing final conversation...")
         
+        # Pending subtitles are moot; ended utterances still need their words committed
+        for task in list(subtitle_tasks):
+            task.cancel()
+        if utterance_tasks:
+            await asyncio.gather(*utterance_tasks, return_exceptions=True)
+        # From here on the streamer belongs to the final job
+
         # Flush file
         session_audio_file.close() # Close handle to ensure flush
         
         try:
-            # Read full file back
             file_size = os.path.getsize(session_audio_file.name)
-            print(f"Reading full audio session from disk: {file_size} bytes")
+            print(f"Session audio on disk: {file_size} bytes")
             
-            if file_size > 0 and asr_engine:
-                 # Read raw bytes
-                with open(session_audio_file.name, "rb") as f:
-                    full_audio_bytes = f.read()
-                
-                # Convert to numpy
-                full_audio = np.frombuffer(full_audio_bytes, dtype=np.float32)
-                
-                duration_seconds = len(full_audio) / 16000
+            if file_size > 0 and asr_pool:
+                duration_seconds = file_size / 4 / SAMPLE_RATE
                 print(f"Total audio duration: {duration_seconds:.2f} seconds")
                 
                 if duration_seconds > 0.5: # Minimum threshold
-                    print(f"Transcribing full session...")
-                    # For very long audio, we might want to split? 
-                    # Faster-whisper handles reasonable lengths well (30s+). 
-                    # If > 30s, it handles it internally via sliding window if configured, 
-                    # but simple transcribe works good enough for minutes usually.
-                    
-                    transcript = await asyncio.to_thread(engine.transcribe_audio_chunk, full_audio)
+                    print(f"Assembling final transcript from streamed segments...")
+                    # Finalization runs ahead of every session's subtitle jobs
+                    try:
+                        transcript = await asyncio.wrap_future(asr_pool.submit(
+                            final_session_transcript, streamer, session_audio_file.name, segmenter, priority=PRIORITY_FINAL
+                        ))
+                    except ASRQueueFull:
+                        # Overloaded: save the streamed words as they are
+                        print("⚠ ASR queue full, saving the streamed transcript without a final pass")
+                        streamer.flush()
+                        transcript = streamer.committed_text()
                     print(f"✓ Final Complete Transcript: {transcript}")
                     
                     if transcript and transcript.strip():
@@ -548,6 +634,9 @@ async def websocket_asr(
         except Exception as e:
             print(f"Error deleting temp file: {e}")
             
+        if asr_pool:
+            model_registry.release("asr")
+
         # Close database connection
         db.close()
 
@@ -9,7 +9,8 @@ import json
 from ..database import get_db
 from ..models import User, ChatMessage as ChatMessageModel
 from ..utils.auth import get_current_user
-from ..services.ai_service import ai_assistant
+from ..services import ai_service  # registers the "assistant" model
+from ai_engine.model_registry import model_registry
 
 router = APIRouter(
     prefix="/chat",
@@ -68,7 +69,7 @@ async def send_chat_message(
         ]
         
         # Generate AI response
-        ai_response = await ai_assistant.generate_response(
+        ai_response = await model_registry.get("assistant").generate_response(
             message=chat_message.message,
             conversation_history=conversation_history,
             db=db,
@@ -168,7 +169,7 @@ async def send_chat_message_streaming(
         async def generate():
             full_response = ""
             try:
-                async for chunk in ai_assistant.generate_streaming_response(
+                async for chunk in model_registry.get("assistant").generate_streaming_response(
                     message=chat_message.message,
                     conversation_history=conversation_history,
                     db=db,
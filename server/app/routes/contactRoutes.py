@@ -12,8 +12,11 @@ import numpy as np
 from ..database import get_db
 from ..models import Contact, User
 from ..utils.auth import get_current_user
-from ai_engine.face_engine import load_models, detect_and_embed
+from ai_engine.face_engine import detect_and_embed, embed_photos, photo_hash
+from ai_engine.face_gallery import gallery_index, drop_near_duplicates
+from ai_engine.model_registry import model_registry
 from ..chroma_client import get_face_collection
+from ..services.enrichment_cache import enrichment_cache
 
 router = APIRouter(
     prefix="/contacts",
@@ -21,15 +24,6 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Load face recognition models once
-face_app = None
-
-def get_face_app():
-    global face_app
-    if face_app is None:
-        face_app = load_models()
-    return face_app
-
 def get_photo_url(contact_id: int, has_photo: bool, request: Request) -> Optional[str]:
     """Generate URL for contact photo endpoint"""
     if not has_photo:
@@ -119,9 +113,6 @@ def sync_contact_to_chroma(contact_id: int, profile_photo: bytes, name: str, rel
         import time
         start_time = time.time()
         
-        # Load face recognition models (should be pre-warmed on startup)
-        app = get_face_app()
-        
         # Convert binary data to OpenCV image
         nparr = np.frombuffer(profile_photo, np.uint8)
         img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
@@ -130,8 +121,9 @@ def sync_contact_to_chroma(contact_id: int, profile_photo: bytes, name: str, rel
             print(f"Error: Could not decode image for {name}")
             return
         
-        # Extract embedding
-        data_list = detect_and_embed(app, img)
+        # Extract embedding; the models (pre-warmed on startup) are held so they cannot be unloaded as idle meanwhile
+        with model_registry.acquire("face") as app:
+            data_list = detect_and_embed(app, img)
         
         if not data_list:
             print(f"Error: No face detected for {name}")
@@ -143,17 +135,22 @@ def sync_contact_to_chroma(contact_id: int, profile_photo: bytes, name: str, rel
         # Get ChromaDB collection
         collection = get_face_collection()
         
+        ids = [f"contact_{contact_id}"]
+        embeddings = [data["embedding"]]
+        metadatas = [{
+            "name": name,
+            "relation": relationship,
+            "contact_id": contact_id,
+            "user_id": user_id,
+            # Lets sync_embeddings_from_db skip this photo while it is unchanged
+            "photo_hash": photo_hash(profile_photo)
+        }]
+        
         # Upsert to ChromaDB with timeout handling (inherent in network request but we catch exceptions)
-        collection.upsert(
-            ids=[f"contact_{contact_id}"],
-            embeddings=[data["embedding"]],
-            metadatas=[{
-                "name": name,
-                "relation": relationship,
-                "contact_id": contact_id,
-                "user_id": user_id
-            }]
-        )
+        collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+        
+        # Keep the in-process recognition gallery in step with ChromaDB
+        gallery_index.upsert(ids, embeddings, metadatas)
         
         total_time = time.time() - start_time
         print(f"✓ Successfully synced {name} to ChromaDB (background task, {total_time:.2f}s)")
@@ -175,57 +172,48 @@ def sync_contact_to_chroma_multiple(contact_id: int, profile_photos: List[bytes]
         import time
         start_time = time.time()
         
-        # Load face recognition models (should be pre-warmed on startup)
-        app = get_face_app()
-        
         # Get ChromaDB collection
         collection = get_face_collection()
         
-        # Process each photo and collect embeddings
-        all_embeddings = []
-        all_ids = []
-        all_metadatas = []
+        # Decode and detect all photos in parallel, then embed the faces in one batch;
+        # the models (pre-warmed on startup) are held so they cannot be unloaded as idle meanwhile
+        with model_registry.acquire("face") as app:
+            photo_embeddings = embed_photos(app, profile_photos)
         
-        for idx, photo_data in enumerate(profile_photos):
-            # Convert binary data to OpenCV image
-            nparr = np.frombuffer(photo_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                print(f"Error: Could not decode image {idx+1} for {name}")
-                continue
-            
-            # Extract embedding
-            data_list = detect_and_embed(app, img)
-            
-            if not data_list:
+        found = []
+        for idx, embedding in enumerate(photo_embeddings):
+            if embedding is None:
                 print(f"Warning: No face detected in image {idx+1} for {name}")
-                continue
-            
-            # Use the first detected face from each photo
-            data = data_list[0]
-            
-            # Add to batch with unique ID for each photo
-            all_ids.append(f"contact_{contact_id}_photo_{idx}")
-            all_embeddings.append(data["embedding"])
-            all_metadatas.append({
-                "name": name,
-                "relation": relationship,
-                "contact_id": contact_id,
-                "user_id": user_id,
-                "photo_index": idx
-            })
-        
-        if not all_embeddings:
+            else:
+                found.append((idx, embedding))
+        
+        if not found:
             print(f"Error: No faces detected in any photos for {name}")
             return
         
-        # Upsert all embeddings to ChromaDB
+        # Near-identical photos add nothing to recognition but grow the gallery
+        kept = [found[i] for i in drop_near_duplicates([embedding for _, embedding in found])]
+        if len(kept) < len(found):
+            print(f"Dropped {len(found) - len(kept)} near-duplicate photos for {name}")
+        
+        # Unique ID for each photo
+        all_ids = [f"contact_{contact_id}_photo_{idx}" for idx, _ in kept]
+        all_embeddings = [embedding for _, embedding in kept]
+        all_metadatas = [{
+            "name": name,
+            "relation": relationship,
+            "contact_id": contact_id,
+            "user_id": user_id,
+            "photo_index": idx
+        } for idx, _ in kept]
+        
+        # Upsert all embeddings to ChromaDB in one call
         collection.upsert(
             ids=all_ids,
             embeddings=all_embeddings,
             metadatas=all_metadatas
         )
+        gallery_index.upsert(all_ids, all_embeddings, all_metadatas)
         
         total_time = time.time() - start_time
         print(f"✓ Successfully synced {len(all_embeddings)} embeddings for {name} to ChromaDB (background task, {total_time:.2f}s)")
@@ -252,6 +240,7 @@ def remove_contact_from_chroma(contact_id: int):
             if results and results['ids']:
                 # Delete all found embeddings
                 collection.delete(ids=results['ids'])
+                gallery_index.remove_contact(contact_id)
                 print(f"Successfully removed {len(results['ids'])} embeddings for contact_{contact_id} from ChromaDB")
             else:
                 print(f"No embeddings found for contact_{contact_id} in ChromaDB")
@@ -259,6 +248,7 @@ def remove_contact_from_chroma(contact_id: int):
             # Fallback: try to delete the old single-photo format
             print(f"Query failed, trying legacy delete: {query_error}")
             collection.delete(ids=[f"contact_{contact_id}"])
+            gallery_index.remove_contact(contact_id)
             print(f"Successfully removed contact_{contact_id} from ChromaDB (legacy format)")
             
     except Exception as e:
@@ -530,4 +520,5 @@ def delete_contact(
     # Hard delete from database
     db.delete(db_contact)
     db.commit()
+    enrichment_cache.invalidate(contact_id)
     return {"message": "Contact deleted successfully"}
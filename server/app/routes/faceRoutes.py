@@ -1,26 +1,57 @@
 import asyncio
+import time
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, WebSocket, WebSocketDisconnect, Query, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-import cv2
-import numpy as np
-from ai_engine.face_engine import load_models, recognize_face, sync_embeddings_from_db
+from ai_engine.face_engine import recognize_face, recognize_tracked, sync_embeddings_from_db
+from ai_engine.face_tracker import FaceTracker
+from ai_engine.image_decode import decode_frame
+from ai_engine.face_scheduler import InferenceQueueFull
+from ai_engine.face_workers import WorkerCrashed, WorkerTimeout
+from ai_engine.model_registry import model_registry
 from ..database import get_db
-from ..models import Contact, User
-from ..models import Contact, User
+from ..models import User
+from ..services.enrichment_cache import enrich_recognition_results
+from ..services.last_seen_writer import last_seen_writer
 from ..utils.auth import get_current_user, SECRET_KEY, ALGORITHM
 from jose import jwt, JWTError
 
 router = APIRouter()
 
-# Face recognition model is loaded lazily to speed up startup
-face_app_loaded = None
+# Upper bound for the frame-rate hint sent to the glass client
+MAX_TARGET_FPS = 30.0
 
-def get_face_app():
-    global face_app_loaded
-    if face_app_loaded is None:
-        face_app_loaded = load_models()
-    return face_app_loaded
+class LatestFrameBuffer:
+    """
+    Single-slot mailbox between the WebSocket receive and processing tasks.
+    A new frame replaces one that has not been picked up yet, so processing
+    always works on the newest frame and stale frames are counted as dropped.
+    """
+    def __init__(self):
+        self._frame = None
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, data):
+        self.received += 1
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = data
+        self._ready.set()
+
+    async def get(self):
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self._frame = self._frame, None
+        return frame
+
+def decode_and_recognize(app, data, tracker, user_id):
+    """Decode a JPEG frame and run tracked recognition; None if the frame is not an image."""
+    img = decode_frame(data)
+    if img is None:
+        return None
+    return recognize_tracked(app, img, tracker, user_id=user_id)
 
 # Images are stored via contacts page, not uploaded directly here
 
@@ -36,109 +67,33 @@ async def recognize_face_endpoint(
     try:
         # Read image directly from memory
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode only the resolution detection needs
+        img = decode_frame(contents)
         
         if img is None:
              raise HTTPException(status_code=400, detail="Invalid image data")
 
         # Pass user_id to restrict recognition to user's contacts
         # Run CPU-bound face recognition in a separate thread to avoid blocking the event loop
-        app = get_face_app()
-        result = await asyncio.to_thread(recognize_face, app, img, user_id=current_user.id)
+        # Held until recognition finishes so the idle unloader cannot drop it mid-call
+        app = await asyncio.to_thread(model_registry.retain, "face")
+        try:
+            result = await asyncio.to_thread(recognize_face, app, img, user_id=current_user.id)
+        finally:
+            model_registry.release("face")
         
         # Ensure result is always a list
         if result is None:
             result = []
         
-        # If contacts are recognized, enrich with details (batch query for performance)
+        # If contacts are recognized, enrich with details (cached per contact)
         if result:
-            from datetime import datetime, timezone
-            from zoneinfo import ZoneInfo
-            from ..models import Interaction
-            
-            # Collect all contact IDs for batch query
-            contact_ids = [res["contact_id"] for res in result if res.get("name") != "Unknown" and "contact_id" in res]
-            
-            if contact_ids:
-                from datetime import timedelta
-
-                # Batch query contacts
-                contacts = db.query(Contact).filter(Contact.id.in_(contact_ids)).all()
-                contact_map = {c.id: c for c in contacts}
-                
-                # Optimized: Fetch top interactions per contact
-                interaction_map = {} 
-                for cid in contact_ids:
-                    # Fetch recent interactions to find the most recent one that's at least 1 hour old
-                    recent = db.query(Interaction).filter(
-                        Interaction.contact_id == cid
-                    ).order_by(Interaction.timestamp.desc()).limit(20).all()
-                    
-                    if recent:
-                        formatted = []
-                        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=1)
-                        
-                        # Find the most recent interaction that is at least 1 hour old
-                        for r in recent:
-                            # Ensure timestamp has timezone info
-                            r_timestamp = r.timestamp
-                            if r_timestamp.tzinfo is None:
-                                r_timestamp = r_timestamp.replace(tzinfo=timezone.utc)
-                            
-                            if r_timestamp < cutoff_time:
-                                formatted.append({
-                                    "summary": r.summary,
-                                    "date": r_timestamp.isoformat(),
-                                    "timestamp": r_timestamp.isoformat()
-                                })
-                                # Only show the most recent one that's at least 1 hour old
-                                break 
-                        
-                        interaction_map[cid] = formatted
-                
-                # Enrich results
-                for res in result:
-                    if res.get("name") != "Unknown" and "contact_id" in res:
-                        contact_id = res["contact_id"]
-                        contact = contact_map.get(contact_id)
-                        
-                        if contact:
-                            # Capture PREVIOUS last_seen time
-                            last_seen_time = contact.last_seen
-                            
-                            # Get current time in IST
-                            ist_tz = ZoneInfo("Asia/Kolkata")
-                            current_time_ist = datetime.now(ist_tz)
-                            
-                            # Ensure timezone info - convert to IST if needed
-                            if last_seen_time:
-                                if last_seen_time.tzinfo is None:
-                                    # Assume UTC if no timezone
-                                    last_seen_time = last_seen_time.replace(tzinfo=timezone.utc)
-                                # Convert to IST for comparison
-                                last_seen_time = last_seen_time.astimezone(ist_tz)
-                            
-                            # Filter Last Seen: Only show if at least 1 hour ago
-                            cutoff_time = current_time_ist - timedelta(hours=1)
-                            
-                            if last_seen_time and last_seen_time < cutoff_time:
-                                res["last_seen_timestamp"] = last_seen_time.isoformat()
-                            else:
-                                res["last_seen_timestamp"] = None
-                            
-                            # Add history list
-                            history = interaction_map.get(contact_id, [])
-                            res["recent_interactions"] = history
-                            res["last_conversation_summary"] = history[0]["summary"] if history else None
-                            
-                            # Update last_seen to NOW in IST
-                            contact.last_seen = current_time_ist
-                
-                db.commit()
+            enrich_recognition_results(db, result)
         
         return JSONResponse(content=result, status_code=200)
 
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -149,11 +104,11 @@ async def sync_faces_from_database(
 ):
     """
     Sync face embeddings from database contacts.
-    This will rebuild the embeddings.json file from all contacts with profile photos.
+    Only contacts whose profile photo changed since the last sync are re-embedded.
     """
     try:
-        app = get_face_app()
-        result = sync_embeddings_from_db(app, db)
+        with model_registry.acquire("face") as app:
+            result = sync_embeddings_from_db(app, db)
         
         if result.get("success"):
             return JSONResponse(
@@ -195,115 +150,80 @@ async def websocket_recognize(
 
     await websocket.accept()
     
+    # Hold the face model for the whole session so it is not unloaded as idle
+    app = await asyncio.to_thread(model_registry.retain, "face")
+
     # Get DB session
     db = next(get_db())
 
-    try:
-        while True:
-            # Receive image bytes
-            data = await websocket.receive_bytes()
-            
-            # Decode image
-            nparr = np.frombuffer(data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            if img is None:
-                continue
-
-            # Run recognition in thread pool
-            app = get_face_app()
-            result = await asyncio.to_thread(recognize_face, app, img, user_id=user_id)
-            
-            if result is None:
-                result = []
+    # Faces are tracked across frames so a steady face is not re-embedded every frame
+    tracker = FaceTracker()
 
-            # Enrich results (copy-paste logic from HTTP endpoint for now, can be refactored later)
-            if result:
-                from datetime import datetime, timezone
-                from zoneinfo import ZoneInfo
-                from ..models import Interaction, Contact
-                
-                contact_ids = [res["contact_id"] for res in result if res.get("name") != "Unknown" and "contact_id" in res]
-                
-                if contact_ids:
-                    from datetime import timedelta
+    frames = LatestFrameBuffer()
+    processing_ms = None
 
-                    contacts = db.query(Contact).filter(Contact.id.in_(contact_ids)).all()
-                    contact_map = {c.id: c for c in contacts}
-                    
-                    # Optimized: Fetch top interactions per contact
-                    interaction_map = {} # contact_id -> list of summaries
-                    
-                    for cid in contact_ids:
-                        recent = db.query(Interaction).filter(
-                            Interaction.contact_id == cid
-                        ).order_by(Interaction.timestamp.desc()).limit(20).all()
-                        
-                        if recent:
-                            formatted = []
-                            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=1)
-                            
-                            for r in recent:
-                                # Ensure timestamp has timezone info
-                                r_timestamp = r.timestamp
-                                if r_timestamp.tzinfo is None:
-                                    r_timestamp = r_timestamp.replace(tzinfo=timezone.utc)
-                                
-                                if r_timestamp < cutoff_time:
-                                    formatted.append({
-                                        "summary": r.summary,
-                                        "date": r_timestamp.isoformat(),
-                                        "timestamp": r_timestamp.isoformat()
-                                    })
-                                    break # Only want the most recent one that's at least 1h old
-                            
-                            interaction_map[cid] = formatted
+    async def receive_frames():
+        # Never blocks on recognition, so the socket buffer cannot back up
+        while True:
+            frames.put(await websocket.receive_bytes())
 
-                    for res in result:
-                        if res.get("name") != "Unknown" and "contact_id" in res:
-                            contact_id = res["contact_id"]
-                            contact = contact_map.get(contact_id)
-                            
-                            if contact:
-                                last_seen_time = contact.last_seen
-                                
-                                # Get current time in IST
-                                ist_tz = ZoneInfo("Asia/Kolkata")
-                                current_time_ist = datetime.now(ist_tz)
-                                
-                                # Ensure timezone info - convert to IST if needed
-                                if last_seen_time:
-                                    if last_seen_time.tzinfo is None:
-                                        # Assume UTC if no timezone
-                                        last_seen_time = last_seen_time.replace(tzinfo=timezone.utc)
-                                    # Convert to IST for comparison
-                                    last_seen_time = last_seen_time.astimezone(ist_tz)
-                                
-                                # Filter Last Seen: Only show if at least 1 hour ago
-                                cutoff_time = current_time_ist - timedelta(hours=1)
-                                
-                                if last_seen_time and last_seen_time < cutoff_time:
-                                    res["last_seen_timestamp"] = last_seen_time.isoformat()
-                                else:
-                                    res["last_seen_timestamp"] = None
-                                
-                                # Add history list
-                                history = interaction_map.get(contact_id, [])
-                                res["recent_interactions"] = history
-                                
-                                # Backward compatibility
-                                res["last_conversation_summary"] = history[0]["summary"] if history else None
-                                
-                                contact.last_seen = current_time_ist
-                    
-                    db.commit()
+    async def process_frames():
+        nonlocal processing_ms
+        while True:
+            data = await frames.get()
+            started = time.perf_counter()
+
+            # Decode and run recognition in thread pool
+            error = None
+            try:
+                result = await asyncio.to_thread(decode_and_recognize, app, data, tracker, user_id)
+                if result is None:
+                    error = "Invalid image data"
+            except (WorkerTimeout, WorkerCrashed) as e:
+                # A hung or crashed worker costs this frame, not the session
+                print(f"Face worker error: {e}")
+                result = None
+                error = str(e)
+
+            if error is None:
+                # Enrich results from the per-contact cache
+                if result:
+                    enrich_recognition_results(db, result)
+
+                # Smoothed processing time drives the client's frame-rate hint
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                processing_ms = elapsed_ms if processing_ms is None else 0.8 * processing_ms + 0.2 * elapsed_ms
+
+            # Every frame gets a reply: the client waits for one before sending the next
+            reply = {
+                "type": "recognition",
+                "results": result or [],
+                "received_frames": frames.received,
+                "dropped_frames": frames.dropped,
+            }
+            if processing_ms is not None:
+                reply["processing_ms"] = round(processing_ms, 1)
+                reply["target_fps"] = round(min(MAX_TARGET_FPS, 1000.0 / max(processing_ms, 1.0)), 1)
+            if error is not None:
+                reply["error"] = error
+            await websocket.send_json(reply)
+
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
 
-            # Send back result
-            await websocket.send_json(result)
+    try:
+        done, _ = await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
 
     except WebSocketDisconnect:
         pass
     except Exception as e:
         print(f"WebSocket Error: {e}")
     finally:
+        receiver.cancel()
+        processor.cancel()
         db.close()
+        model_registry.release("face")
+        # Persist this session's sightings now rather than at the next periodic flush
+        await asyncio.to_thread(last_seen_writer.flush)
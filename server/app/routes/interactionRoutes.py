@@ -8,6 +8,7 @@ from zoneinfo import ZoneInfo
 from ..database import get_db
 from ..models import Interaction, User, Contact
 from ..utils.auth import get_current_user
+from ..services.enrichment_cache import enrichment_cache
 
 router = APIRouter(
     prefix="/interactions",
@@ -242,6 +243,8 @@ def create_interaction(
     db.add(db_interaction)
     db.commit()
     db.refresh(db_interaction)
+    if db_interaction.contact_id:
+        enrichment_cache.invalidate(db_interaction.contact_id)
     
     # Index in ChromaDB
     try:
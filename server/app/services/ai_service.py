@@ -11,6 +11,7 @@ from google import genai
 from google.genai import types
 
 from ..models import User, Contact, Reminder, Alert, Interaction, SOSContact
+from ai_engine.model_registry import model_registry
 
 
 class MindTraceAI:
@@ -400,5 +401,5 @@ Remember: You have access to the user's current data (contacts, reminders, alert
             yield "I apologize, but I encountered an error. Please try again."
 
 
-# Global AI instance
-ai_assistant = MindTraceAI()
+# Loaded on first use through the model registry
+model_registry.register("assistant", MindTraceAI, unloadable=False)
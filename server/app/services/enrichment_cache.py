@@ -0,0 +1,176 @@
+"""
+TTL cache of the per-contact details attached to face recognition results.
+Keeps a steady recognized face from re-querying contacts and interactions on every frame.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models import Contact, Interaction
+from .last_seen_writer import last_seen_writer
+
+FACE_ENRICHMENT_TTL = float(os.getenv("FACE_ENRICHMENT_TTL", "60"))
+MAX_ENTRIES = 10000
+RECENT_INTERACTIONS = 20
+
+
+def _as_utc(ts: datetime) -> datetime:
+    # Ensure timestamp has timezone info
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+class _ContactEntry:
+    def __init__(self, last_seen, interactions):
+        self.last_seen = last_seen
+        # [(summary, aware timestamp)], newest first
+        self.interactions = interactions
+        self.fetched_at = time.monotonic()
+
+
+class ContactEnrichmentCache:
+    """
+    Contact last_seen and recent interaction history, keyed by contact_id.
+    Misses are filled with one Contact query and one Interaction query for all
+    missing contacts in the frame. Entries expire after FACE_ENRICHMENT_TTL
+    seconds and are invalidated when an interaction is saved for the contact.
+    The "older than 1 hour" filters run at read time, so cached entries stay correct.
+    """
+
+    def __init__(self, ttl: float = FACE_ENRICHMENT_TTL, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, db: Session, contact_ids):
+        """Return {contact_id: entry} for contacts that exist, loading misses in bulk."""
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for cid in set(contact_ids):
+                entry = self._entries.get(cid)
+                if entry is not None and now - entry.fetched_at < self.ttl:
+                    self._entries.move_to_end(cid)
+                    found[cid] = entry
+                    self.hits += 1
+                else:
+                    missing.append(cid)
+                    self.misses += 1
+
+        if missing:
+            loaded = self._load(db, missing)
+            with self._lock:
+                for cid, entry in loaded.items():
+                    self._entries[cid] = entry
+                    self._entries.move_to_end(cid)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            found.update(loaded)
+        return found
+
+    def _load(self, db: Session, contact_ids):
+        contacts = db.query(Contact.id, Contact.last_seen).filter(Contact.id.in_(contact_ids)).all()
+
+        # Top N interactions per contact in a single query
+        ranked = db.query(
+            Interaction.contact_id,
+            Interaction.summary,
+            Interaction.timestamp,
+            func.row_number().over(
+                partition_by=Interaction.contact_id,
+                order_by=Interaction.timestamp.desc()
+            ).label("rank")
+        ).filter(Interaction.contact_id.in_(contact_ids)).subquery()
+        rows = db.query(ranked).filter(ranked.c.rank <= RECENT_INTERACTIONS).order_by(
+            ranked.c.contact_id, ranked.c.rank
+        ).all()
+
+        history = {}
+        for row in rows:
+            if row.timestamp is not None:
+                history.setdefault(row.contact_id, []).append((row.summary, _as_utc(row.timestamp)))
+
+        # Sightings still in the write-behind buffer are newer than the database
+        pending = last_seen_writer.pending(contact_ids)
+        return {
+            c.id: _ContactEntry(pending.get(c.id, c.last_seen), history.get(c.id, []))
+            for c in contacts
+        }
+
+    def mark_seen(self, contact_id: int, when: datetime):
+        """Record a sighting in the cached entry."""
+        with self._lock:
+            entry = self._entries.get(contact_id)
+            if entry is not None:
+                entry.last_seen = when
+
+    def invalidate(self, contact_id: int):
+        with self._lock:
+            self._entries.pop(contact_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+enrichment_cache = ContactEnrichmentCache()
+
+
+def enrich_recognition_results(db: Session, result: list) -> list:
+    """
+    Attach last-seen and last-conversation details to recognized faces and
+    record the sighting. Served from the enrichment cache when warm; last_seen
+    is persisted by the write-behind writer, so no commit happens here.
+    Returns the contact_ids that were seen.
+    """
+    contact_ids = [res["contact_id"] for res in result if res.get("name") != "Unknown" and "contact_id" in res]
+    if not contact_ids:
+        return []
+
+    entries = enrichment_cache.get_many(db, contact_ids)
+
+    # Get current time in IST
+    ist_tz = ZoneInfo("Asia/Kolkata")
+    current_time_ist = datetime.now(ist_tz)
+    # Filter Last Seen / conversations: only show if at least 1 hour ago
+    cutoff_time = current_time_ist - timedelta(hours=1)
+
+    seen = []
+    for res in result:
+        if res.get("name") == "Unknown" or "contact_id" not in res:
+            continue
+        contact_id = res["contact_id"]
+        entry = entries.get(contact_id)
+        if entry is None:
+            continue
+
+        # Capture PREVIOUS last_seen time, converted to IST
+        last_seen_time = entry.last_seen
+        if last_seen_time:
+            last_seen_time = _as_utc(last_seen_time).astimezone(ist_tz)
+        res["last_seen_timestamp"] = last_seen_time.isoformat() if last_seen_time and last_seen_time < cutoff_time else None
+
+        # Only show the most recent interaction that's at least 1 hour old
+        history = []
+        for summary, ts in entry.interactions:
+            if ts < cutoff_time:
+                history.append({"summary": summary, "date": ts.isoformat(), "timestamp": ts.isoformat()})
+                break
+        res["recent_interactions"] = history
+        # Backward compatibility
+        res["last_conversation_summary"] = history[0]["summary"] if history else None
+
+        # Update last_seen to NOW in IST
+        enrichment_cache.mark_seen(contact_id, current_time_ist)
+        seen.append(contact_id)
+
+    last_seen_writer.record(seen, current_time_ist)
+    return seen
@@ -0,0 +1,110 @@
+"""
+Write-behind buffer for Contact.last_seen.
+Recognition records sightings in memory; they are written to the database in
+one bulk UPDATE every few seconds, and on disconnect or shutdown.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam
+
+from ..database import SessionLocal
+from ..models import Contact
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_FLUSH_INTERVAL = float(os.getenv("LAST_SEEN_FLUSH_INTERVAL", "5"))
+
+
+class LastSeenWriter:
+    """Keeps the latest sighting per contact and flushes them together."""
+
+    def __init__(self, flush_interval: float = LAST_SEEN_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.running = False
+        self._pending = {}
+        # Batch being written; still reported by pending() until its commit finishes
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        # Serializes flushes so a periodic and a disconnect flush never overlap
+        self._flush_lock = threading.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+
+    def record(self, contact_ids, when: datetime):
+        """Note that these contacts were seen at `when`; later sightings overwrite earlier ones."""
+        with self._lock:
+            for cid in contact_ids:
+                self._pending[cid] = when
+
+    def pending(self, contact_ids):
+        """Sightings not yet written, for readers that load last_seen from the database."""
+        with self._lock:
+            found = {cid: self._in_flight[cid] for cid in contact_ids if cid in self._in_flight}
+            found.update((cid, self._pending[cid]) for cid in contact_ids if cid in self._pending)
+            return found
+
+    def flush(self):
+        """Write all buffered sightings in one transaction. Blocking; returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            if not batch:
+                return 0
+
+            db = SessionLocal()
+            try:
+                table = Contact.__table__
+                stmt = table.update().where(table.c.id == bindparam("contact_id")).values(
+                    last_seen=bindparam("seen_at")
+                )
+                db.execute(stmt, [{"contact_id": cid, "seen_at": when} for cid, when in batch.items()])
+                db.commit()
+                with self._lock:
+                    self._in_flight = {}
+                self.flushes += 1
+                self.rows_written += len(batch)
+                return len(batch)
+            except Exception as e:
+                logger.error(f"Error flushing last_seen updates: {e}")
+                db.rollback()
+                # Put the batch back unless a newer sighting arrived meanwhile
+                with self._lock:
+                    for cid, when in batch.items():
+                        self._pending.setdefault(cid, when)
+                    self._in_flight = {}
+                return 0
+            finally:
+                db.close()
+
+    async def start(self):
+        """Flush periodically until stopped"""
+        self.running = True
+        logger.info("last_seen writer started")
+
+        while self.running:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def stop(self):
+        """Stop the periodic loop and write whatever is still buffered"""
+        self.running = False
+        self.flush()
+        logger.info("last_seen writer stopped")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "flush_interval": self.flush_interval,
+            "pending": pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written
+        }
+
+
+last_seen_writer = LastSeenWriter()
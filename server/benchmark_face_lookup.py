@@ -0,0 +1,110 @@
+"""
+Benchmark per-frame face lookup latency against the number of faces in view.
+Compares the old per-face ChromaDB path (collection fetch + count + one query per face),
+a single batched multi-embedding ChromaDB query, and the in-process FaceGallery
+matrix multiply that recognize_face uses.
+
+Uses a throwaway collection on the configured ChromaDB server, so no contacts are touched.
+Usage: python benchmark_face_lookup.py [max_faces] [frames_per_point]
+"""
+import os
+import sys
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+# Ensure we can import from ai_engine
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+from app.chroma_client import get_chroma_client
+from ai_engine.face_gallery import FaceGallery
+
+BENCH_COLLECTION = "faces_benchmark"
+GALLERY_SIZE = 200
+EMBEDDING_DIM = 512
+USER_ID = 1
+
+def random_embeddings(n, rng):
+    emb = rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    return emb.tolist()
+
+def get_bench_collection():
+    client = get_chroma_client()
+    return client.get_or_create_collection(name=BENCH_COLLECTION, metadata={"hnsw:space": "cosine"})
+
+def sequential_frame(embeddings):
+    # Mirrors the previous recognize_face: collection + count per frame, one query per face
+    collection = get_bench_collection()
+    if collection.count() == 0:
+        return
+    for emb in embeddings:
+        collection.query(query_embeddings=[emb], n_results=1, where={"user_id": USER_ID})
+
+def query_nearest_faces(collection, embeddings, where=None):
+    """
+    Find the nearest stored face for every embedding with a single ChromaDB query.
+    Returns a list of (similarity, metadata) aligned with `embeddings`;
+    metadata is None when nothing was found for that embedding.
+    """
+    if not embeddings:
+        return []
+
+    query_result = collection.query(
+        query_embeddings=embeddings,
+        n_results=1,
+        where=where,
+        include=["metadatas", "distances"]
+    )
+
+    matches = []
+    ids = (query_result or {}).get("ids") or []
+    for i in range(len(embeddings)):
+        if i < len(ids) and ids[i]:
+            distance = query_result["distances"][i][0]
+            matches.append((1.0 - distance, query_result["metadatas"][i][0]))
+        else:
+            matches.append((0.0, None))
+    return matches
+
+def batched_frame(collection, embeddings):
+    query_nearest_faces(collection, embeddings, where={"user_id": USER_ID})
+
+def time_frames(fn, frames):
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.median(samples), np.percentile(samples, 95)
+
+def main():
+    max_faces = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    rng = np.random.default_rng(0)
+
+    print(f"Populating '{BENCH_COLLECTION}' with {GALLERY_SIZE} random embeddings...")
+    collection = get_bench_collection()
+    ids = [f"bench_{i}" for i in range(GALLERY_SIZE)]
+    gallery_embeddings = random_embeddings(GALLERY_SIZE, rng)
+    metadatas = [{"name": f"Person {i}", "relation": "bench", "contact_id": i, "user_id": USER_ID} for i in range(GALLERY_SIZE)]
+    collection.upsert(ids=ids, embeddings=gallery_embeddings, metadatas=metadatas)
+    gallery = FaceGallery(ids, gallery_embeddings, metadatas)
+
+    try:
+        print(f"\n{'faces':>5} | {'sequential p50/p95 (ms)':>24} | {'batched p50/p95 (ms)':>22} | {'in-process p50/p95 (ms)':>24}")
+        print("-" * 84)
+        for n_faces in range(1, max_faces + 1):
+            embeddings = random_embeddings(n_faces, rng)
+            seq = time_frames(lambda: sequential_frame(embeddings), frames)
+            bat = time_frames(lambda: batched_frame(collection, embeddings), frames)
+            mem = time_frames(lambda: gallery.match(embeddings), frames)
+            print(f"{n_faces:>5} | {seq[0]:>11.1f} / {seq[1]:>10.1f} | {bat[0]:>9.1f} / {bat[1]:>10.1f} | {mem[0]:>11.3f} / {mem[1]:>10.3f}")
+    finally:
+        get_chroma_client().delete_collection(BENCH_COLLECTION)
+        print(f"\nCleanup: deleted '{BENCH_COLLECTION}'")
+
+if __name__ == "__main__":
+    main()
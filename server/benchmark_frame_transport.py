@@ -0,0 +1,73 @@
+"""
+Benchmark frame hand-off from the API process to an inference worker process.
+Compares pickling the decoded BGR array through a multiprocessing queue with
+staging it in a shared-memory FrameRing slot and sending only (slot, shape).
+The worker touches every pixel row so both paths pay for actually reading the frame.
+
+Usage: python benchmark_frame_transport.py [frames_per_size]
+"""
+import os
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+
+# Ensure we can import from ai_engine
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_engine.frame_ring import FrameRing
+
+SIZES = [(480, 640), (720, 1280), (1080, 1920)]
+SLOTS = 4
+
+def worker(requests, results, ring_spec):
+    ring = FrameRing.attach(*ring_spec)
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        image = ring.view(*item) if isinstance(item, tuple) else item
+        # Compact result, as the real workers return
+        results.put(int(image[:, ::8, 0].sum()))
+    ring.close()
+
+def run(requests, results, payloads):
+    samples = []
+    for payload in payloads:
+        start = time.perf_counter()
+        requests.put(payload())
+        results.get()
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.median(samples), np.percentile(samples, 95)
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ctx = mp.get_context("spawn")
+    ring = FrameRing(slots=SLOTS, slot_bytes=max(h * w * 3 for h, w in SIZES))
+    requests, results = ctx.Queue(), ctx.Queue()
+    proc = ctx.Process(target=worker, args=(requests, results, (ring.name, ring.slots, ring.slot_bytes)), daemon=True)
+    proc.start()
+
+    try:
+        print(f"{'frame':>10} | {'pickled p50/p95 (ms)':>22} | {'shared mem p50/p95 (ms)':>24} | speedup")
+        print("-" * 72)
+        for h, w in SIZES:
+            image = np.random.default_rng(0).integers(0, 255, (h, w, 3), dtype=np.uint8)
+
+            pickled = run(requests, results, [lambda: image] * frames)
+
+            def staged():
+                frame = ring.stage(image)
+                # Single in-flight request, so the slot can be recycled right after the reply
+                ring.release(frame.slot)
+                return frame.ref()
+
+            shared = run(requests, results, [staged] * frames)
+            print(f"{w:>5}x{h:<4} | {pickled[0]:>9.2f} / {pickled[1]:>9.2f} | {shared[0]:>10.2f} / {shared[1]:>10.2f} | {pickled[0] / shared[0]:.1f}x")
+    finally:
+        requests.put(None)
+        proc.join(timeout=5)
+        ring.close()
+
+if __name__ == "__main__":
+    main()
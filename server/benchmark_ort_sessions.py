@@ -0,0 +1,106 @@
+"""
+Sweep ONNX Runtime session settings for the face models on this host.
+For each configuration the buffalo_s pack is loaded with those settings, then
+every concurrency level runs that many threads issuing detection + ArcFace
+calls, as concurrent recognition sessions do. Reports per-call latency and
+total throughput, and prints the best FACE_ORT_* settings per concurrency.
+
+Usage: python benchmark_ort_sessions.py [--image photo.jpg] [--concurrency 1,4]
+                                        [--iterations 40] [--faces 4] [--quick]
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+import numpy as np
+import cv2
+
+# Ensure we can import from ai_engine
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_engine.face_engine import load_models
+from ai_engine.ort_tuning import OrtSessionConfig, available_cpus
+
+def build_grid(cpus, quick):
+    threads = sorted({0, 1, 2, 4, max(1, cpus // 2), cpus} & set(range(0, cpus + 1)))
+    spinning = [True, False]
+    modes = ["sequential"] if quick else ["sequential", "parallel"]
+    graph_opts = ["all"] if quick else ["all", "extended"]
+    for intra, spin, mode, graph_opt in itertools.product(threads, spinning, modes, graph_opts):
+        yield OrtSessionConfig(intra_threads=intra, execution_mode=mode, graph_opt=graph_opt, spinning=spin)
+
+def run_level(app, image, crops, concurrency, iterations):
+    """Each thread runs `iterations` detect + embed calls; returns latencies and wall time."""
+    latencies = []
+    lock = threading.Lock()
+    rec_model = app.models['recognition']
+
+    def caller():
+        local = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            app.det_model.detect(image, max_num=0, metric='default')
+            rec_model.get_feat(crops)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+def describe(config):
+    c = config.as_dict()
+    return f"intra={c['intra_threads'] or 'auto'} spin={int(c['spinning'])} {c['execution_mode'][:3]} opt={c['graph_opt']}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Test photo; a blank 640x480 frame is used if omitted")
+    parser.add_argument("--concurrency", default=None, help="Comma-separated caller counts (default 1 and cores/2)")
+    parser.add_argument("--iterations", type=int, default=40, help="Calls per caller thread")
+    parser.add_argument("--faces", type=int, default=4, help="ArcFace crops per call")
+    parser.add_argument("--quick", action="store_true", help="Only sweep threads and spinning")
+    args = parser.parse_args()
+
+    cpus = len(available_cpus())
+    levels = [int(x) for x in args.concurrency.split(",")] if args.concurrency else sorted({1, max(1, cpus // 2)})
+
+    image = cv2.imread(args.image) if args.image else np.zeros((480, 640, 3), dtype=np.uint8)
+    if image is None:
+        sys.exit(f"Could not read image {args.image}")
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 255, (112, 112, 3), dtype=np.uint8) for _ in range(args.faces)]
+
+    print(f"{cpus} CPUs available, concurrency levels {levels}, {args.iterations} calls per caller\n")
+    print(f"{'configuration':<42} | {'callers':>7} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'calls/s':>8}")
+    print("-" * 86)
+
+    best = {}
+    for config in build_grid(cpus, args.quick):
+        app = load_models(config)
+        # Warm up so the first-run allocations are not timed
+        run_level(app, image, crops, 1, 3)
+        for level in levels:
+            latencies, wall = run_level(app, image, crops, level, args.iterations)
+            throughput = len(latencies) / wall
+            p50, p95 = np.percentile(latencies, 50), np.percentile(latencies, 95)
+            print(f"{describe(config):<42} | {level:>7} | {p50:>8.1f} | {p95:>8.1f} | {throughput:>8.1f}")
+            if level not in best or throughput > best[level][1]:
+                best[level] = (config, throughput, p50)
+        del app
+
+    print("\nBest throughput per concurrency level:")
+    for level, (config, throughput, p50) in sorted(best.items()):
+        c = config.as_dict()
+        print(f"  {level} callers: {throughput:.1f} calls/s, p50 {p50:.1f} ms")
+        print(f"    FACE_ORT_INTRA_THREADS={c['intra_threads']} FACE_ORT_SPINNING={str(c['spinning']).lower()} "
+              f"FACE_ORT_EXECUTION_MODE={c['execution_mode']} FACE_ORT_GRAPH_OPT={c['graph_opt']}")
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,9 @@ from ai_engine.face_engine import load_models, sync_embeddings_from_db
 from app.database import SessionLocal
 
 def main():
+    # --restart ignores the checkpoint left by an interrupted run
+    resume = "--restart" not in sys.argv[1:]
+
     print("Loading face recognition models...")
     face_app = load_models()
     
@@ -23,10 +26,11 @@ def main():
     
     try:
         print("Syncing face embeddings from database contacts...")
-        result = sync_embeddings_from_db(face_app, db)
+        result = sync_embeddings_from_db(face_app, db, resume=resume)
         
         if result.get("success"):
-            print(f"\n✓ Successfully synced {result['count']} face embeddings!")
+            print(f"\n✓ Successfully synced {result['count']} face embeddings "
+                  f"({result['skipped']} unchanged, {result['failed']} without a face)")
         else:
             print(f"\n✗ Error: {result.get('error')}")
     finally:
@@ -0,0 +1,132 @@
+"""
+Compare INT8 face models against fp32 on a local photo set before adopting them.
+
+For every photo both detectors run, and the fp32 landmarks are embedded by
+both recognizers, so detector and recognizer drift are measured separately:
+  - detection: fp32 faces the INT8 detector also finds (IoU >= 0.5), box IoU
+  - embeddings: cosine similarity between fp32 and INT8 embeddings of the same face
+  - match decisions: leave-one-out nearest neighbour at the recognition threshold,
+    fp32 decision vs INT8 decision (and accuracy, if photos sit in per-person folders)
+  - latency of each model at both precisions
+
+Usage: python verify_int8_faces.py <photo_dir> [--mode dynamic|static] [--threshold 0.45]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import cv2
+
+# Ensure we can import from ai_engine
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from insightface.utils import face_align
+from ai_engine.face_engine import load_models
+from ai_engine.face_gallery import normalize_rows
+from ai_engine.face_quantize import list_images
+from ai_engine.face_tracker import iou_matrix
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def embed(app, image, kpss):
+    rec_model = app.models['recognition']
+    crops = [face_align.norm_crop(image, landmark=kps, image_size=rec_model.input_size[0]) for kps in kpss]
+    return rec_model.get_feat(crops)
+
+def leave_one_out(embeddings, labels, threshold):
+    """Nearest other face for each face; its label if similar enough, else None (Unknown)."""
+    emb = normalize_rows(embeddings)
+    similarities = emb @ emb.T
+    np.fill_diagonal(similarities, -1.0)
+    best = similarities.argmax(axis=1)
+    return [labels[j] if similarities[i, j] > threshold else None for i, j in enumerate(best)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("photo_dir", help="Photos to compare on; subfolder names are used as identities")
+    parser.add_argument("--mode", choices=["dynamic", "static"], default="dynamic")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("FACE_RECOGNITION_THRESHOLD", "0.45")))
+    args = parser.parse_args()
+
+    paths = list_images(args.photo_dir)
+    if not paths:
+        sys.exit(f"No photos found in {args.photo_dir}")
+
+    fp32 = load_models(precision="fp32")
+    int8 = load_models(precision=f"int8_{args.mode}")
+
+    det_found, det_ious, cosines = [], [], []
+    fp32_embs, int8_embs, labels = [], [], []
+    times = {"fp32 detect": [], "int8 detect": [], "fp32 embed": [], "int8 embed": []}
+
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+
+        (boxes_fp32, kpss), ms = timed(fp32.det_model.detect, image, max_num=0, metric='default')
+        times["fp32 detect"].append(ms)
+        (boxes_int8, _), ms = timed(int8.det_model.detect, image, max_num=0, metric='default')
+        times["int8 detect"].append(ms)
+        if len(boxes_fp32) == 0:
+            continue
+
+        if len(boxes_int8):
+            ious = iou_matrix(boxes_fp32[:, :4], boxes_int8[:, :4]).max(axis=1)
+        else:
+            ious = np.zeros(len(boxes_fp32))
+        det_found.extend(ious >= 0.5)
+        det_ious.extend(ious[ious >= 0.5])
+
+        # Same landmarks for both recognizers, so only ArcFace precision differs
+        emb_fp32, ms = timed(embed, fp32, image, kpss)
+        times["fp32 embed"].append(ms)
+        emb_int8, ms = timed(embed, int8, image, kpss)
+        times["int8 embed"].append(ms)
+        cosines.extend(np.sum(normalize_rows(emb_fp32) * normalize_rows(emb_int8), axis=1))
+
+        # Largest face is the labelled identity of the photo
+        largest = int(np.argmax((boxes_fp32[:, 2] - boxes_fp32[:, 0]) * (boxes_fp32[:, 3] - boxes_fp32[:, 1])))
+        fp32_embs.append(emb_fp32[largest])
+        int8_embs.append(emb_int8[largest])
+        rel_dir = os.path.dirname(os.path.relpath(path, args.photo_dir))
+        labels.append(rel_dir or None)
+
+    if not cosines:
+        sys.exit("No faces detected in the photo set")
+
+    cosines = np.array(cosines)
+    print(f"Photos: {len(paths)}, faces (fp32): {len(det_found)}, mode: int8_{args.mode}\n")
+
+    print("Detection")
+    print(f"  fp32 faces also found by INT8: {np.mean(det_found) * 100:.1f}%")
+    print(f"  mean IoU of found faces:       {np.mean(det_ious) if det_ious else 0.0:.3f}\n")
+
+    print("Embeddings (cosine fp32 vs INT8)")
+    print(f"  mean {cosines.mean():.4f}  p5 {np.percentile(cosines, 5):.4f}  min {cosines.min():.4f}\n")
+
+    if len(fp32_embs) > 1:
+        dec_fp32 = leave_one_out(np.array(fp32_embs), labels, args.threshold)
+        dec_int8 = leave_one_out(np.array(int8_embs), labels, args.threshold)
+        agree = np.mean([a == b for a, b in zip(dec_fp32, dec_int8)])
+        print(f"Match decisions at threshold {args.threshold}")
+        print(f"  fp32 and INT8 agree: {agree * 100:.1f}% of {len(labels)} photos")
+        # Only identities with another photo in the set can be matched correctly
+        labelled = [i for i, label in enumerate(labels) if label is not None and labels.count(label) > 1]
+        if labelled:
+            for name, decisions in (("fp32", dec_fp32), ("int8", dec_int8)):
+                accuracy = np.mean([decisions[i] == labels[i] for i in labelled])
+                print(f"  {name} accuracy vs folder labels: {accuracy * 100:.1f}%")
+        print()
+
+    print("Latency per photo (ms)")
+    for name, samples in times.items():
+        if samples:
+            print(f"  {name:<12} p50 {np.percentile(samples, 50):7.2f}  p95 {np.percentile(samples, 95):7.2f}")
+
+if __name__ == "__main__":
+    main()